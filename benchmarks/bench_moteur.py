@@ -0,0 +1,97 @@
+"""Benchmark hors ligne du moteur de planification.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.bench_moteur --echelles 1k 13k --mode dsatur
+    python -m benchmarks.bench_moteur --echelles 13k --essais 8 --json resultats.json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.donnees_synthetiques import ECHELLES, donnees_moteur, generer
+from moteur_edt import CRENEAUX, MODES, planifier_examens, planifier_multi_depart
+
+DATE_DEBUT = datetime(2026, 1, 10)
+DATE_FIN = datetime(2026, 1, 25)
+
+
+def mesurer(echelle, mode="glouton", nb_essais=1, graine=0):
+    durees = {}
+
+    debut = time.perf_counter()
+    tables = generer(echelle, graine)
+    durees["donnees_synthetiques"] = time.perf_counter() - debut
+
+    tracemalloc.start()
+    debut_total = time.perf_counter()
+
+    debut = time.perf_counter()
+    modules, salles, profs, inscriptions = donnees_moteur(tables)
+    durees["matrice_inscriptions"] = time.perf_counter() - debut
+
+    options = dict(date_debut=DATE_DEBUT, date_fin=DATE_FIN, creneaux=CRENEAUX, mode=mode,
+                   max_salles_par_slot=ECHELLES[echelle]["max_salles_par_slot"])
+    if nb_essais > 1:
+        plan = planifier_multi_depart(modules, salles, profs, inscriptions,
+                                      nb_essais=nb_essais, graine=graine, **options)
+    else:
+        plan = planifier_examens(modules, salles, profs, inscriptions, **options)
+
+    temps_total = time.perf_counter() - debut_total
+    _, pic_memoire = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durees.update(plan.get("durees", {}))
+    return {
+        "echelle": echelle,
+        "mode": mode,
+        "essais": nb_essais,
+        "etudiants": len(tables["etudiants"]),
+        "modules": len(modules),
+        "inscriptions": len(tables["inscriptions"]),
+        "salles": len(salles),
+        "profs": len(profs),
+        "max_salles_par_slot": options["max_salles_par_slot"],
+        "places": len(plan["examens"]),
+        "echecs": len(plan["echecs"]),
+        "temps_s": round(temps_total, 4),
+        "pic_memoire_mo": round(pic_memoire / 2**20, 2),
+        "phases_s": {phase: round(d, 4) for phase, d in durees.items()},
+    }
+
+
+def afficher(resultat):
+    print(f"== {resultat['echelle']} ({resultat['mode']}, {resultat['essais']} essai(s)) ==")
+    print(f"  {resultat['etudiants']} étudiants, {resultat['modules']} modules, "
+          f"{resultat['inscriptions']} inscriptions, {resultat['salles']} salles "
+          f"({resultat['max_salles_par_slot']} par créneau), {resultat['profs']} profs")
+    print(f"  placés : {resultat['places']}  échecs : {resultat['echecs']}")
+    print(f"  temps  : {resultat['temps_s']:.3f} s  pic mémoire : {resultat['pic_memoire_mo']:.1f} Mo")
+    for phase, duree in resultat["phases_s"].items():
+        print(f"    {phase:<22} {duree:.4f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--echelles", nargs="+", default=["1k", "13k"], choices=list(ECHELLES))
+    parser.add_argument("--mode", default="glouton", choices=list(MODES))
+    parser.add_argument("--essais", type=int, default=1, help="multi-départ si > 1")
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--json", help="fichier de sortie JSON")
+    args = parser.parse_args()
+
+    resultats = []
+    for echelle in args.echelles:
+        resultat = mesurer(echelle, args.mode, args.essais, args.graine)
+        afficher(resultat)
+        resultats.append(resultat)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
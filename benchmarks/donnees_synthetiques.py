@@ -0,0 +1,162 @@
+"""Jeu de données synthétique reproductible, au schéma de la base examens.
+
+Les tables sont renvoyées sous forme de listes de dicts (une clé par
+colonne), prêtes à être insérées en base ou converties pour le moteur.
+
+Créer une base SQLite locale (depuis la racine du dépôt) :
+    python -m benchmarks.donnees_synthetiques --echelle 13k examens.db
+    EXAMENS_SQLITE=examens.db streamlit run dashboard.py
+"""
+import argparse
+import os
+import random
+
+import numpy as np
+
+from db import BackendSQLite, inserer_tables
+from matrice_inscriptions import MatriceInscriptions
+
+# Nombre d'étudiants -> dimensions de la faculté. `max_salles_par_slot`
+# suit la taille de la faculté : à 50k, les ~5 700 examens ne tiennent pas
+# dans 16 jours x 3 créneaux x 50 salles, et les échecs ne mesureraient
+# plus que le calendrier.
+ECHELLES = {
+    "1k": {"etudiants": 1_000, "departements": 3, "formations": 16, "salles": 30, "profs": 60,
+           "max_salles_par_slot": 50},
+    "13k": {"etudiants": 13_000, "departements": 7, "formations": 200, "salles": 120, "profs": 700,
+            "max_salles_par_slot": 50},
+    "50k": {"etudiants": 50_000, "departements": 12, "formations": 760, "salles": 400, "profs": 2_600,
+            "max_salles_par_slot": 200},
+}
+
+MODULES_PAR_FORMATION = (6, 9)
+PROBA_OPTION = 0.3          # module optionnel pris dans une autre formation du département
+CAPACITES_SALLES = [20, 30, 40, 60]
+CAPACITES_AMPHIS = [100, 150, 200, 300]
+PART_AMPHIS = 0.3
+
+
+def generer(echelle="13k", graine=0):
+    dims = ECHELLES[echelle]
+    rng = random.Random(graine)
+
+    departements = [{"id": d + 1, "nom": f"Département {d + 1}"} for d in range(dims["departements"])]
+
+    formations = []
+    for f in range(dims["formations"]):
+        formations.append({
+            "id": f + 1,
+            "nom": f"Formation {f + 1}",
+            "dept_id": departements[f % len(departements)]["id"],
+        })
+
+    modules = []
+    modules_par_formation = {}
+    for formation in formations:
+        for _ in range(rng.randint(*MODULES_PAR_FORMATION)):
+            module = {"id": len(modules) + 1, "nom": f"Module {len(modules) + 1}",
+                      "formation_id": formation["id"]}
+            modules.append(module)
+            modules_par_formation.setdefault(formation["id"], []).append(module["id"])
+
+    formations_par_dept = {}
+    for formation in formations:
+        formations_par_dept.setdefault(formation["dept_id"], []).append(formation)
+
+    etudiants = []
+    inscriptions = []
+    for e in range(dims["etudiants"]):
+        formation = formations[rng.randrange(len(formations))]
+        etudiant = {"id": e + 1, "nom": f"Nom{e + 1}", "prenom": f"Prenom{e + 1}",
+                    "formation_id": formation["id"]}
+        etudiants.append(etudiant)
+
+        for module_id in modules_par_formation[formation["id"]]:
+            inscriptions.append({"etudiant_id": etudiant["id"], "module_id": module_id})
+
+        if rng.random() < PROBA_OPTION:
+            autre = rng.choice(formations_par_dept[formation["dept_id"]])
+            if autre["id"] != formation["id"]:
+                module_id = rng.choice(modules_par_formation[autre["id"]])
+                inscriptions.append({"etudiant_id": etudiant["id"], "module_id": module_id})
+
+    lieux_examen = []
+    for s in range(dims["salles"]):
+        amphi = rng.random() < PART_AMPHIS
+        lieux_examen.append({
+            "id": s + 1,
+            "nom": f"{'Amphi' if amphi else 'Salle'} {s + 1}",
+            "capacite": rng.choice(CAPACITES_AMPHIS if amphi else CAPACITES_SALLES),
+            "type": "amphi" if amphi else "salle",
+        })
+
+    professeurs = []
+    for p in range(dims["profs"]):
+        professeurs.append({
+            "id": p + 1,
+            "nom": f"Prof {p + 1}",
+            "dept_id": departements[p % len(departements)]["id"],
+        })
+
+    return {
+        "departements": departements,
+        "formations": formations,
+        "modules": modules,
+        "etudiants": etudiants,
+        "inscriptions": inscriptions,
+        "lieux_examen": lieux_examen,
+        "professeurs": professeurs,
+    }
+
+
+def donnees_moteur(tables):
+    """Mêmes structures que `charger_donnees_planification` côté dashboard."""
+    inscriptions = MatriceInscriptions(
+        np.fromiter((i["module_id"] for i in tables["inscriptions"]), dtype=np.int64),
+        np.fromiter((i["etudiant_id"] for i in tables["inscriptions"]), dtype=np.int64),
+    )
+    effectifs = inscriptions.effectifs()
+    dept_formation = {f["id"]: f["dept_id"] for f in tables["formations"]}
+
+    modules = [{
+        "module_id": m["id"],
+        "module": m["nom"],
+        "formation_id": m["formation_id"],
+        "dept_id": dept_formation[m["formation_id"]],
+        "nb_etudiants": effectifs.get(m["id"], 0),
+    } for m in tables["modules"]]
+    modules.sort(key=lambda m: -m["nb_etudiants"])
+
+    salles = sorted(({"id": s["id"], "capacite": s["capacite"], "nom": s["nom"]}
+                     for s in tables["lieux_examen"]), key=lambda s: -s["capacite"])
+    profs = [{"id": p["id"], "nom": p["nom"]} for p in tables["professeurs"]]
+    return modules, salles, profs, inscriptions
+
+
+def ecrire_sqlite(tables, chemin):
+    if os.path.exists(chemin):
+        os.remove(chemin)
+    backend = BackendSQLite(chemin)
+    backend.initialiser()
+    conn = backend.connecter()
+    try:
+        inserer_tables(conn, tables)
+    finally:
+        conn.close()
+    return backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("chemin", help="fichier SQLite à créer (écrasé s'il existe)")
+    parser.add_argument("--echelle", default="13k", choices=list(ECHELLES))
+    parser.add_argument("--graine", type=int, default=0)
+    args = parser.parse_args()
+
+    tables = generer(args.echelle, args.graine)
+    ecrire_sqlite(tables, args.chemin)
+    print(f"{args.chemin} : " + ", ".join(f"{len(lignes)} {table}" for table, lignes in tables.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Détection des conflits d'examens par balayage (sweep-line) vectorisé.
+
+Pour chaque ressource (salle, professeur, étudiant) les examens sont triés
+par début ; un examen chevauche tous ceux qui suivent dans la même
+ressource et commencent avant sa fin, ce qu'un seul `searchsorted` donne
+pour tous les examens à la fois. Coût O(n log n + nombre de conflits).
+"""
+import numpy as np
+import pandas as pd
+
+COLONNES_PAIRES = ["examen_1", "examen_2", "ressource"]
+
+
+def paires_chevauchantes(ressources, debuts, fins):
+    """Indices (i, j) des intervalles [debut, fin) qui se chevauchent sur
+    une même ressource. Entrées : tableaux d'entiers de même longueur.
+    """
+    ressources = np.asarray(ressources, dtype=np.int64)
+    debuts = np.asarray(debuts, dtype=np.int64)
+    fins = np.asarray(fins, dtype=np.int64)
+    if len(debuts) < 2:
+        vide = np.empty(0, dtype=np.int64)
+        return vide, vide
+
+    origine = debuts.min()
+    debuts = debuts - origine
+    fins = np.maximum(fins - origine, debuts)
+    ecart = int(fins.max()) + 1
+
+    # Tri par (ressource, début) ; la clé combinée garde chaque ressource
+    # dans sa propre plage de valeurs
+    ordre = np.lexsort((debuts, ressources))
+    cle_debut = ressources[ordre] * ecart + debuts[ordre]
+    cle_fin = ressources[ordre] * ecart + fins[ordre]
+
+    position = np.arange(len(ordre))
+    borne = np.searchsorted(cle_debut, cle_fin, side="left")
+    nb = np.maximum(borne - position - 1, 0)
+
+    i = np.repeat(position, nb)
+    decalage = np.arange(nb.sum()) - np.repeat(np.cumsum(nb) - nb, nb)
+    j = i + 1 + decalage
+    return ordre[i], ordre[j]
+
+
+def _minutes(dates):
+    return pd.to_datetime(dates).to_numpy().astype("datetime64[m]").astype(np.int64)
+
+
+def detecter_conflits(examens, inscriptions=None):
+    """examens : DataFrame (id, module_id, lieu_id, prof_id, date_heure, duree_minutes).
+    inscriptions : MatriceInscriptions optionnelle pour les conflits étudiants.
+
+    Retourne {"salles", "profs", "etudiants"} -> DataFrame des paires en
+    conflit (examen_1, examen_2, ressource) ; pour les étudiants,
+    `ressource` est le nombre d'étudiants concernés par la paire.
+    """
+    vide = pd.DataFrame(columns=COLONNES_PAIRES)
+    conflits = {"salles": vide, "profs": vide, "etudiants": vide}
+    if examens.empty:
+        return conflits
+
+    ids = examens["id"].to_numpy()
+    debuts = _minutes(examens["date_heure"])
+    fins = debuts + examens["duree_minutes"].to_numpy(dtype=np.int64)
+
+    for cle, colonne in (("salles", "lieu_id"), ("profs", "prof_id")):
+        ressources = examens[colonne].to_numpy(dtype=np.int64)
+        i, j = paires_chevauchantes(ressources, debuts, fins)
+        conflits[cle] = pd.DataFrame({"examen_1": ids[i], "examen_2": ids[j], "ressource": ressources[i]})
+
+    if inscriptions is not None and inscriptions.nb_modules:
+        # Une ligne (étudiant, examen) par inscription au module de l'examen
+        module_ids = examens["module_id"].to_numpy(dtype=np.int64)
+        rangs = np.minimum(np.searchsorted(inscriptions.module_ids, module_ids), inscriptions.nb_modules - 1)
+        connus = np.flatnonzero(inscriptions.module_ids[rangs] == module_ids)
+        rangs = rangs[connus]
+        debut_ligne = inscriptions.indptr[rangs]
+        longueurs = inscriptions.indptr[rangs + 1] - debut_ligne
+        examen_ligne = np.repeat(connus, longueurs)
+        position = np.repeat(debut_ligne - (np.cumsum(longueurs) - longueurs), longueurs) + np.arange(longueurs.sum())
+        etudiants = inscriptions.indices[position]
+
+        i, j = paires_chevauchantes(etudiants, debuts[examen_ligne], fins[examen_ligne])
+        paires = pd.DataFrame({"examen_1": ids[examen_ligne[i]], "examen_2": ids[examen_ligne[j]]})
+        # Une paire d'examens par ligne, ordonnée, avec le nombre d'étudiants touchés
+        paires[["examen_1", "examen_2"]] = np.sort(paires[["examen_1", "examen_2"]].to_numpy(), axis=1)
+        conflits["etudiants"] = (paires.groupby(["examen_1", "examen_2"]).size()
+                                 .reset_index(name="ressource"))
+
+    return conflits
@@ -1,10 +1,24 @@
 import streamlit as st
-import mysql.connector
 import pandas as pd
+import os
+import re
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 
+from conflits import detecter_conflits
+from diagnostics import DIAGNOSTICS, cache_data
+from db import PoolConnexions, backend_depuis_config, copier_vers_sqlite, creer_tables_auxiliaires, inserer_par_lots
+from export_edt import FORMATS as FORMATS_EXPORT, exporter, parquet_disponible
+from matrice_inscriptions import MatriceInscriptions
+from moteur_edt import MODES as MODES_PLANIFICATION, Calendrier, planifier_examens, planifier_multi_depart
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
 # ==============================
 # CONFIGURATION
 # ==============================
@@ -12,7 +26,20 @@ DUREE_EXAM = 90
 CRENEAUX = ["08:30", "11:00", "14:00"]
 DATE_DEBUT = datetime(2026, 1, 10)
 DATE_FIN = datetime(2026, 1, 25)
+JOURS_EXCLUS = []   # 0 = lundi ... 6 = dimanche, ex. [4] pour exclure les vendredis
+DATES_EXCLUES = []  # jours fériés, ex. [datetime(2026, 1, 12)]
 MAX_SALLES_PER_SLOT = 50
+SNAPSHOT_SQLITE = "edt_publie.db"   # instantané lecture seule du planning publié
+DOSSIER_INSTANTANES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instantanes")
+POOL_TAILLE = 10              # connexions BDD réutilisées par processus
+POOL_RECYCLAGE_S = 1800       # une connexion plus vieille est rouverte
+TAILLE_PAGE_EDT = 50          # examens par page dans la vue EDT complète
+VERSION_POLL_S = 2            # délai max pour voir une écriture faite par un autre processus
+INSCRIPTIONS_POLL_S = 60      # délai max pour répercuter une modification des inscriptions
+JOB_PROGRESSION_S = 1.0       # intervalle min entre deux écritures de progression d'un job
+JOB_POLL_S = 1                # sondage du job de génération par la page admin
+JOB_BATTEMENT_S = 5           # un job en cours rafraîchit maj_le à ce rythme
+JOB_EXPIRATION_S = 60         # job sans nouvelles depuis ce délai : considéré abandonné
 
 # Configuration des rôles
 ROLES = {
@@ -73,6 +100,18 @@ st.markdown("""
         border-radius: 10px;
         margin: 15px 0;
     }
+    .table-examens {
+        width: 100%;
+        border-collapse: collapse;
+    }
+    .table-examens th, .table-examens td {
+        padding: 6px 10px;
+        border-bottom: 1px solid #e0e0e0;
+        text-align: left;
+    }
+    .table-examens th {
+        background: #e3f2fd;
+    }
     .dept-section {
         background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);
         padding: 15px;
@@ -93,23 +132,60 @@ if "user_name" not in st.session_state:
     st.session_state.user_name = None
 if "user_dept_id" not in st.session_state:
     st.session_state.user_dept_id = None
+if "user_prof_id" not in st.session_state:
+    st.session_state.user_prof_id = None
+if "user_etudiant_id" not in st.session_state:
+    st.session_state.user_etudiant_id = None
 
 # ==============================
 # CONNEXION BDD
 # ==============================
+@st.cache_resource
+def get_backend():
+    # MySQL par défaut ; SQLite embarqué via EXAMENS_SQLITE ou [sqlite] dans les secrets
+    return backend_depuis_config(st.secrets)
+
+@st.cache_resource
+def get_pool():
+    # Un seul pool par processus : plus de handshake TCP + auth à chaque requête
+    return PoolConnexions(get_backend(), taille=POOL_TAILLE, recyclage=POOL_RECYCLAGE_S, mesure=DIAGNOSTICS)
+
 def get_connection():
+    # close() rend la connexion au pool
     try:
-        return mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],
-            user=st.secrets["mysql"]["user"],
-            password=st.secrets["mysql"]["password"],
-            database=st.secrets["mysql"]["database"],
-            port=st.secrets["mysql"]["port"]
-        )
-    except mysql.connector.Error as err:
+        return get_pool().connexion()
+    except Exception as err:
         st.error(f"❌ Erreur de connexion : {err}")
         return None
 
+@st.cache_resource
+def initialiser_base():
+    # Tables dérivées (signatures, effectifs, KPI, EDT dénormalisé) créées une fois par processus
+    conn = get_connection()
+    if conn:
+        try:
+            creer_tables_auxiliaires(conn)
+            if not getattr(get_backend(), "lecture_seule", False):
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT (SELECT COUNT(*) FROM examens), (SELECT COUNT(*) FROM edt_snapshot),
+                           (SELECT COUNT(*) FROM edt_etudiants), (SELECT COUNT(*) FROM kpi_snapshot)
+                """)
+                nb_examens, nb_snapshot, nb_index, nb_kpis = cur.fetchall()[0]
+                if nb_examens != nb_snapshot or (nb_examens and not nb_index):
+                    # EDT enregistré avant l'existence des tables dérivées
+                    apres_ecriture_examens(conn)
+                    conn.commit()
+                elif not nb_kpis:
+                    # Instantané des KPI jamais calculé (première mise en service)
+                    rafraichir_kpis(conn)
+                    conn.commit()
+        except Exception as e:
+            st.warning(f"⚠️ Tables dérivées non créées : {e}")
+        finally:
+            conn.close()
+    return True
+
 def execute_query(query, params=None):
     conn = get_connection()
     if not conn:
@@ -133,12 +209,12 @@ def execute_query(query, params=None):
 # ==============================
 # REQUÊTES DONNÉES
 # ==============================
-@st.cache_data(ttl=300)
+@cache_data(ttl=300)
 def get_departements():
     query = "SELECT id, nom FROM departements ORDER BY nom"
     return execute_query(query)
 
-@st.cache_data(ttl=300)
+@cache_data(ttl=300)
 def get_formations_by_dept(dept_id=None):
     if dept_id:
         query = "SELECT id, nom FROM formations WHERE dept_id = %s ORDER BY nom"
@@ -146,7 +222,7 @@ def get_formations_by_dept(dept_id=None):
     query = "SELECT id, nom, dept_id FROM formations ORDER BY nom"
     return execute_query(query)
 
-@st.cache_data(ttl=300)
+@cache_data(ttl=300)
 def get_professeurs_by_dept(dept_id=None):
     if dept_id:
         query = "SELECT id, nom FROM professeurs WHERE dept_id = %s ORDER BY nom"
@@ -154,106 +230,236 @@ def get_professeurs_by_dept(dept_id=None):
     query = "SELECT id, nom, dept_id FROM professeurs ORDER BY nom"
     return execute_query(query)
 
-@st.cache_data(ttl=60)
-def load_edt_complete(dept_id=None, formation_id=None, date_filter=None):
-    query = """
-    SELECT 
-        e.id,
-        m.nom AS module,
-        f.nom AS formation,
-        f.id AS formation_id,
-        p.nom AS professeur,
-        l.nom AS salle,
-        l.capacite,
-        e.date_heure,
-        e.duree_minutes,
-        COUNT(DISTINCT i.etudiant_id) AS nb_inscrits,
-        d.nom AS departement,
-        d.id AS departement_id
-    FROM examens e
-    JOIN modules m ON m.id = e.module_id
-    JOIN formations f ON f.id = m.formation_id
-    JOIN departements d ON d.id = f.dept_id
-    JOIN professeurs p ON p.id = e.prof_id
-    JOIN lieux_examen l ON l.id = e.lieu_id
-    LEFT JOIN inscriptions i ON i.module_id = e.module_id
-    WHERE 1=1
-    """
+@cache_data(ttl=300)
+def get_salles():
+    query = "SELECT id, nom FROM lieux_examen ORDER BY nom"
+    return execute_query(query)
+
+COLONNES_EDT = """
+    examen_id AS id, module, formation, formation_id, professeur, salle, capacite,
+    date_heure, duree_minutes, nb_inscrits, departement, dept_id AS departement_id
+"""
+
+@cache_data(max_entries=32)
+def load_edt_complete(version, dept_id=None, formation_id=None, date_filter=None):
+    # Lecture de l'EDT dénormalisé : un balayage d'index, sans jointure
+    query = f"SELECT {COLONNES_EDT} FROM edt_snapshot WHERE 1=1"
     params = []
     if dept_id:
-        query += " AND d.id = %s"
+        query += " AND dept_id = %s"
         params.append(dept_id)
     if formation_id:
-        query += " AND f.id = %s"
+        query += " AND formation_id = %s"
         params.append(formation_id)
     if date_filter:
-        query += " AND DATE(e.date_heure) = %s"
-        params.append(date_filter)
+        jour = pd.Timestamp(date_filter).to_pydatetime()
+        query += " AND date_heure >= %s AND date_heure < %s"
+        params.extend([jour, jour + timedelta(days=1)])
     
-    query += """
-    GROUP BY e.id, m.nom, f.nom, f.id, p.nom, l.nom, l.capacite, 
-             e.date_heure, e.duree_minutes, d.nom, d.id
-    ORDER BY e.date_heure, f.nom
+    query += " ORDER BY date_heure, formation"
+    return execute_query(query, params=tuple(params) if params else None)
+
+def filtrer_edt(filtres):
+    # Clause WHERE commune à la page et au comptage de la vue EDT complète
+    clauses, params = ["1=1"], []
+    for colonne in ("dept_id", "formation_id", "lieu_id", "prof_id"):
+        if filtres.get(colonne):
+            clauses.append(f"{colonne} = %s")
+            params.append(filtres[colonne])
+    if filtres.get("etudiant_id"):
+        clauses.append("examen_id IN (SELECT examen_id FROM edt_etudiants WHERE etudiant_id = %s)")
+        params.append(filtres["etudiant_id"])
+    if filtres.get("date_debut"):
+        clauses.append("date_heure >= %s")
+        params.append(datetime.combine(filtres["date_debut"], datetime.min.time()))
+    if filtres.get("date_fin"):
+        clauses.append("date_heure < %s")
+        params.append(datetime.combine(filtres["date_fin"], datetime.min.time()) + timedelta(days=1))
+    if filtres.get("recherche"):
+        clauses.append("(module LIKE %s OR formation LIKE %s OR professeur LIKE %s OR salle LIKE %s)")
+        params.extend([f"%{filtres['recherche']}%"] * 4)
+    return " AND ".join(clauses), params
+
+def boutons_export(filtres, nom_fichier, nom_calendrier="Examens", formats=("csv", "parquet", "ics")):
+    # Le fichier n'est produit qu'au clic (callable), en lisant edt_snapshot par lots
+    where, params = filtrer_edt(filtres)
+    formats = [f for f in formats if f != "parquet" or parquet_disponible()]
+    
+    def generateur(format_):
+        def generer():
+            conn = get_connection()
+            if not conn:
+                return b""
+            try:
+                return exporter(conn, format_, where, params, nom_calendrier)
+            finally:
+                conn.close()
+        return generer
+    
+    for col, format_ in zip(st.columns(len(formats)), formats):
+        libelle, mime = FORMATS_EXPORT[format_]
+        col.download_button(f"📥 {libelle}", generateur(format_), f"{nom_fichier}.{format_}", mime,
+                            key=f"export_{nom_fichier}_{format_}", use_container_width=True)
+
+@cache_data(max_entries=64)
+def compter_edt(version, filtres):
+    where, params = filtrer_edt(filtres)
+    query = f"""
+    SELECT COUNT(*) AS nb_examens,
+           COUNT(DISTINCT dept_id) AS nb_departements,
+           COUNT(DISTINCT formation_id) AS nb_formations
+    FROM edt_snapshot
+    WHERE {where}
+    """
+    result = execute_query(query, params=tuple(params) if params else None)
+    if result.empty:
+        return {"nb_examens": 0, "nb_departements": 0, "nb_formations": 0}
+    return {key: int(val) for key, val in result.iloc[0].items()}
+
+@cache_data(max_entries=256)
+def page_edt(version, filtres, apres=None, taille=TAILLE_PAGE_EDT):
+    # Pagination par clé sur (date_heure, id) : `apres` est la clé du dernier
+    # examen de la page précédente, le coût ne dépend pas du numéro de page
+    where, params = filtrer_edt(filtres)
+    if apres:
+        where += " AND (date_heure, examen_id) > (%s, %s)"
+        params.extend(apres)
+    query = f"""
+    SELECT {COLONNES_EDT}
+    FROM edt_snapshot
+    WHERE {where}
+    ORDER BY date_heure, examen_id
+    LIMIT {int(taille)}
     """
     return execute_query(query, params=tuple(params) if params else None)
 
-@st.cache_data(ttl=60)
-def get_kpis_globaux():
+KPIS = ["nb_examens", "nb_salles", "nb_profs", "nb_etudiants",
+        "nb_conflits_salles", "nb_conflits_profs", "nb_conflits_etudiants"]
+
+def calculer_conflits(conn):
+    # Balayage en mémoire (conflits.py) au lieu des auto-jointures sur examens
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT id, module_id, lieu_id, prof_id, date_heure, duree_minutes FROM examens")
+    examens = pd.DataFrame(cur.fetchall(),
+                           columns=["id", "module_id", "lieu_id", "prof_id", "date_heure", "duree_minutes"])
+    return detecter_conflits(examens, get_matrice_inscriptions(get_signature_inscriptions()))
+
+def rafraichir_kpis(conn):
+    # Appelé dans la transaction de chaque écriture sur examens :
+    # la détection des conflits ne tourne plus à chaque affichage
     queries = {
         "nb_examens": "SELECT COUNT(*) as val FROM examens",
         "nb_salles": "SELECT COUNT(*) as val FROM lieux_examen",
         "nb_profs": "SELECT COUNT(*) as val FROM professeurs",
         "nb_etudiants": "SELECT COUNT(*) as val FROM etudiants",
-        "nb_conflits_salles": """
-            SELECT COUNT(*) as val FROM (
-                SELECT e1.id FROM examens e1
-                JOIN examens e2 ON e1.lieu_id = e2.lieu_id AND e1.id < e2.id
-                WHERE e1.date_heure < DATE_ADD(e2.date_heure, INTERVAL e2.duree_minutes MINUTE)
-                AND DATE_ADD(e1.date_heure, INTERVAL e1.duree_minutes MINUTE) > e2.date_heure
-            ) conflicts
-        """,
-        "nb_conflits_profs": """
-            SELECT COUNT(*) as val FROM (
-                SELECT e1.id FROM examens e1
-                JOIN examens e2 ON e1.prof_id = e2.prof_id AND e1.id < e2.id
-                WHERE e1.date_heure < DATE_ADD(e2.date_heure, INTERVAL e2.duree_minutes MINUTE)
-                AND DATE_ADD(e1.date_heure, INTERVAL e1.duree_minutes MINUTE) > e2.date_heure
-            ) conflicts
-        """
     }
     
-    kpis = {}
+    cur = conn.cursor()
+    valeurs = {}
     for key, query in queries.items():
-        result = execute_query(query)
-        kpis[key] = float(result.iloc[0, 0]) if not result.empty else 0
-    return kpis
+        cur.execute(query)
+        valeurs[key] = int(cur.fetchall()[0][0] or 0)
+    
+    conflits = calculer_conflits(conn)
+    valeurs["nb_conflits_salles"] = len(conflits["salles"])
+    valeurs["nb_conflits_profs"] = len(conflits["profs"])
+    valeurs["nb_conflits_etudiants"] = len(conflits["etudiants"])
+    
+    cur.execute("DELETE FROM kpi_snapshot")
+    cur.execute(f"""
+        INSERT INTO kpi_snapshot (id, {', '.join(KPIS)}, calcule_le)
+        VALUES (1, {', '.join(['%s'] * len(KPIS))}, %s)
+    """, tuple(valeurs[key] for key in KPIS) + (datetime.now(),))
+
+def rafraichir_edt_snapshot(conn):
+    # Aplatit la jointure examens / modules / formations / départements /
+    # professeurs / salles une fois par écriture plutôt qu'à chaque lecture
+    cur = conn.cursor()
+    cur.execute("DELETE FROM edt_snapshot")
+    cur.execute("""
+        INSERT INTO edt_snapshot (examen_id, module_id, module, formation_id, formation, dept_id, departement,
+                                  prof_id, professeur, lieu_id, salle, capacite, date_heure, duree_minutes,
+                                  nb_inscrits)
+        SELECT e.id, m.id, m.nom, f.id, f.nom, d.id, d.nom, p.id, p.nom, l.id, l.nom, l.capacite,
+               e.date_heure, e.duree_minutes, COALESCE(em.nb_etudiants, 0)
+        FROM examens e
+        JOIN modules m ON m.id = e.module_id
+        JOIN formations f ON f.id = m.formation_id
+        JOIN departements d ON d.id = f.dept_id
+        JOIN professeurs p ON p.id = e.prof_id
+        JOIN lieux_examen l ON l.id = e.lieu_id
+        LEFT JOIN effectifs_modules em ON em.module_id = e.module_id
+    """)
+
+def incrementer_version_edt(conn):
+    cur = conn.cursor()
+    cur.execute("UPDATE edt_version SET version = version + 1 WHERE id = 1")
+    if cur.rowcount == 0:
+        cur.execute("INSERT INTO edt_version (id, version) VALUES (1, 1)")
 
-@st.cache_data(ttl=60)
-def get_occupation_globale():
+@cache_data(ttl=VERSION_POLL_S)
+def get_version_edt():
+    # Lecture par clé primaire, passée en argument (donc dans la clé de
+    # cache) de toutes les requêtes qui dépendent de examens
+    result = execute_query("SELECT version FROM edt_version WHERE id = 1")
+    return int(result.iloc[0]["version"]) if not result.empty else 0
+
+def signaler_ecriture_examens():
+    # Après commit : ce processus voit la nouvelle version sans attendre le sondage
+    get_version_edt.clear()
+
+def rafraichir_edt_etudiants(conn):
+    # Index inversé étudiant -> examens, lu par le calendrier personnel
+    cur = conn.cursor()
+    cur.execute("DELETE FROM edt_etudiants")
+    cur.execute("""
+        INSERT INTO edt_etudiants (etudiant_id, examen_id)
+        SELECT i.etudiant_id, e.id
+        FROM examens e
+        JOIN inscriptions i ON i.module_id = e.module_id
+    """)
+
+def apres_ecriture_examens(conn):
+    # Point unique de mise à jour des données dérivées de examens,
+    # dans la transaction de l'écriture
+    incrementer_version_edt(conn)
+    rafraichir_effectifs(conn)
+    rafraichir_edt_snapshot(conn)
+    rafraichir_edt_etudiants(conn)
+    rafraichir_kpis(conn)
+
+@cache_data(max_entries=4)
+def get_kpis_globaux(version):
+    query = f"SELECT {', '.join(KPIS)} FROM kpi_snapshot WHERE id = 1"
+    result = execute_query(query)
+    
+    # Lecture seule : l'instantané est rempli par initialiser_base et les écritures
+    if result.empty:
+        return {key: 0 for key in KPIS}
+    return {key: float(result.iloc[0][key]) for key in KPIS}
+
+@cache_data(max_entries=4)
+def get_occupation_globale(version):
     query = """
     SELECT 
         l.nom AS salle,
         l.capacite,
         COUNT(e.id) AS nb_examens,
         ROUND(AVG(CASE 
-            WHEN ins.nb_inscrits IS NOT NULL 
-            THEN (ins.nb_inscrits / l.capacite) * 100 
+            WHEN em.nb_etudiants IS NOT NULL 
+            THEN em.nb_etudiants * 100.0 / l.capacite 
             ELSE 0 
         END), 1) AS taux_occupation
     FROM lieux_examen l
     LEFT JOIN examens e ON e.lieu_id = l.id
-    LEFT JOIN (
-        SELECT module_id, COUNT(etudiant_id) AS nb_inscrits
-        FROM inscriptions
-        GROUP BY module_id
-    ) ins ON ins.module_id = e.module_id
+    LEFT JOIN effectifs_modules em ON em.module_id = e.module_id
     GROUP BY l.id, l.nom, l.capacite
     ORDER BY taux_occupation DESC
     """
     return execute_query(query)
 
-@st.cache_data(ttl=60)
-def get_stats_par_departement():
+@cache_data(max_entries=4)
+def get_stats_par_departement(version):
     query = """
     SELECT 
         d.nom AS departement,
@@ -269,14 +475,14 @@ def get_stats_par_departement():
     """
     return execute_query(query)
 
-@st.cache_data(ttl=60)
-def get_heures_enseignement():
+@cache_data(max_entries=4)
+def get_heures_enseignement(version):
     query = """
     SELECT 
         p.nom AS professeur,
         d.nom AS departement,
         COUNT(e.id) AS nb_examens,
-        SUM(e.duree_minutes) / 60 AS heures_totales,
+        SUM(e.duree_minutes) / 60.0 AS heures_totales,
         COUNT(s.examen_id) AS nb_surveillances
     FROM professeurs p
     JOIN departements d ON d.id = p.dept_id
@@ -288,15 +494,17 @@ def get_heures_enseignement():
     """
     return execute_query(query)
 
-@st.cache_data(ttl=60)
-def get_surveillances_par_jour():
-    query = """
+@cache_data(max_entries=4)
+def get_surveillances_par_jour(version):
+    backend = get_backend()
+    horaires = backend.concat_distinct(backend.heure_minute("e.date_heure"), "e.date_heure")
+    query = f"""
     SELECT 
         DATE(e.date_heure) AS date,
         p.nom AS professeur,
         d.nom AS departement,
         COUNT(e.id) AS nb_examens_jour,
-        GROUP_CONCAT(DISTINCT TIME_FORMAT(e.date_heure, '%H:%i') ORDER BY e.date_heure SEPARATOR ', ') AS horaires
+        {horaires} AS horaires
     FROM examens e
     JOIN professeurs p ON p.id = e.prof_id
     JOIN departements d ON d.id = p.dept_id
@@ -306,203 +514,585 @@ def get_surveillances_par_jour():
     """
     return execute_query(query)
 
-@st.cache_data(ttl=60)
-def get_edt_etudiant(formation_id):
+@cache_data(max_entries=1024)
+def get_planning_enseignant(version, prof_id):
+    # Parcours de l'index examens(prof_id, date_heure), jointures par clé primaire
     query = """
-    SELECT DISTINCT
-        e.id,
-        m.nom AS module,
-        f.nom AS formation,
-        f.id AS formation_id,
-        p.nom AS professeur,
-        l.nom AS salle,
-        l.capacite,
-        e.date_heure,
-        e.duree_minutes,
-        COUNT(DISTINCT i.etudiant_id) AS nb_inscrits,
-        d.nom AS departement,
-        d.id AS departement_id
+    SELECT e.id, m.nom AS module, f.nom AS formation, d.nom AS departement,
+           l.nom AS salle, e.date_heure, COALESCE(em.nb_etudiants, 0) AS nb_inscrits
     FROM examens e
     JOIN modules m ON m.id = e.module_id
     JOIN formations f ON f.id = m.formation_id
     JOIN departements d ON d.id = f.dept_id
-    JOIN professeurs p ON p.id = e.prof_id
     JOIN lieux_examen l ON l.id = e.lieu_id
-    LEFT JOIN inscriptions i ON i.module_id = e.module_id
-    WHERE f.id = %s
-    GROUP BY e.id, m.nom, f.nom, f.id, p.nom, l.nom, l.capacite, 
-             e.date_heure, e.duree_minutes, d.nom, d.id
-    ORDER BY e.date_heure, f.nom
+    LEFT JOIN effectifs_modules em ON em.module_id = e.module_id
+    WHERE e.prof_id = %s
+    ORDER BY e.date_heure
     """
-    return execute_query(query, params=(formation_id,))
+    return execute_query(query, params=(prof_id,))
+
+@cache_data(max_entries=4096)
+def get_edt_etudiant(version, etudiant_id):
+    # Index inversé étudiant -> examens (edt_etudiants) puis EDT dénormalisé
+    # par clé : coût proportionnel au nombre d'examens de l'étudiant
+    query = f"""
+    SELECT {COLONNES_EDT}
+    FROM edt_snapshot
+    WHERE examen_id IN (SELECT examen_id FROM edt_etudiants WHERE etudiant_id = %s)
+    ORDER BY date_heure, examen_id
+    """
+    return execute_query(query, params=(etudiant_id,))
+
+def get_etudiant(etudiant_id):
+    query = """
+    SELECT e.id, e.nom, e.prenom, f.dept_id
+    FROM etudiants e
+    LEFT JOIN formations f ON f.id = e.formation_id
+    WHERE e.id = %s
+    """
+    return execute_query(query, params=(etudiant_id,))
+
+def get_signature_inscriptions():
+    query = """
+    SELECT 
+        COUNT(*) AS nb,
+        COALESCE(SUM(module_id), 0) AS somme_modules,
+        COALESCE(SUM(etudiant_id), 0) AS somme_etudiants,
+        COALESCE(SUM(module_id * etudiant_id), 0) AS somme_paires
+    FROM inscriptions
+    """
+    result = execute_query(query)
+    return tuple(int(v) for v in result.iloc[0]) if not result.empty else None
+
+@st.cache_resource(max_entries=1)
+def get_matrice_inscriptions(signature):
+    # Reconstruite uniquement quand la signature des inscriptions change
+    df = execute_query("SELECT module_id, etudiant_id FROM inscriptions")
+    if df.empty:
+        return MatriceInscriptions([], [])
+    return MatriceInscriptions(df["module_id"].to_numpy(), df["etudiant_id"].to_numpy())
+
+def rafraichir_effectifs(conn):
+    # Effectif de chaque module, joint par les vues EDT à la place de
+    # COUNT(DISTINCT) sur inscriptions
+    cur = conn.cursor()
+    cur.execute("DELETE FROM effectifs_modules")
+    cur.execute("""
+        INSERT INTO effectifs_modules (module_id, nb_etudiants)
+        SELECT module_id, COUNT(*) FROM inscriptions GROUP BY module_id
+    """)
+
+@cache_data(ttl=INSCRIPTIONS_POLL_S)
+def synchroniser_inscriptions():
+    # Les inscriptions changent hors de l'application : quand leur signature
+    # diffère de celle enregistrée, les tables dérivées (effectifs, EDT
+    # dénormalisé, index étudiant -> examens, KPI) sont reconstruites et la
+    # version de l'EDT incrémentée, comme après une écriture dans examens
+    signature = get_signature_inscriptions()
+    if signature is None or getattr(get_backend(), "lecture_seule", False):
+        return signature
+    texte = ":".join(str(v) for v in signature)
+    conn = get_connection()
+    if not conn:
+        return signature
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT signature FROM inscriptions_signature WHERE id = 1")
+        ligne = cur.fetchone()
+        if ligne is None or ligne[0] != texte:
+            apres_ecriture_examens(conn)
+            cur.execute("DELETE FROM inscriptions_signature")
+            cur.execute("INSERT INTO inscriptions_signature (id, signature) VALUES (1, %s)", (texte,))
+            conn.commit()
+            signaler_ecriture_examens()
+    except Exception as e:
+        conn.rollback()
+        st.error(f"❌ Erreur synchronisation des inscriptions : {e}")
+    finally:
+        conn.close()
+    return signature
+
+@cache_data(max_entries=4)
+def get_rapport_conflits(version):
+    # Paires d'examens en conflit, avec module / salle / professeur / date
+    conn = get_connection()
+    if not conn:
+        return {}
+    try:
+        conflits = calculer_conflits(conn)
+    finally:
+        conn.close()
+    
+    details = execute_query("""
+    SELECT e.id, m.nom AS module, l.nom AS salle, p.nom AS professeur, e.date_heure
+    FROM examens e
+    JOIN modules m ON m.id = e.module_id
+    JOIN lieux_examen l ON l.id = e.lieu_id
+    JOIN professeurs p ON p.id = e.prof_id
+    """).set_index("id")
+    
+    ressources = {"salles": "lieu_id", "profs": "prof_id", "etudiants": "nb_etudiants"}
+    return {
+        cle: (paires.rename(columns={"ressource": ressources[cle]})
+              .join(details.add_suffix("_1"), on="examen_1")
+              .join(details.add_suffix("_2"), on="examen_2"))
+        for cle, paires in conflits.items()
+    }
 
 # ==============================
 # GÉNÉRATION EDT
 # ==============================
-def generer_edt_optimiser():
+def charger_donnees_planification(cur):
+    cur.execute("""
+        SELECT 
+            m.id AS module_id,
+            m.nom AS module,
+            f.id AS formation_id,
+            f.dept_id AS dept_id,
+            COALESCE(COUNT(DISTINCT i.etudiant_id), 1) AS nb_etudiants
+        FROM modules m
+        JOIN formations f ON f.id = m.formation_id
+        LEFT JOIN inscriptions i ON i.module_id = m.id
+        GROUP BY m.id, m.nom, f.id, f.dept_id
+        ORDER BY nb_etudiants DESC
+    """)
+    modules = cur.fetchall()
+
+    cur.execute("SELECT id, capacite, nom FROM lieux_examen ORDER BY capacite DESC")
+    salles = cur.fetchall()
+
+    cur.execute("SELECT id, nom FROM professeurs")
+    profs = cur.fetchall()
+    return modules, salles, profs
+
+def enregistrer_signatures_plan(cur, inscriptions, module_ids):
+    signatures = inscriptions.signatures()
+    cur.executemany("""
+        REPLACE INTO plan_modules (module_id, signature) VALUES (%s, %s)
+    """, [(m, signatures.get(m, 0)) for m in module_ids])
+
+COLONNES_PLAN = "module_id, prof_id, lieu_id, date_heure, duree_minutes, valide_chef, valide_doyen"
+
+def sauvegarder_plan_precedent(cur):
+    # Copie du plan publié et de ses signatures, que restaurer_plan_precedent() remet en place
+    cur.execute("DELETE FROM examens_precedent")
+    cur.execute(f"INSERT INTO examens_precedent (id, {COLONNES_PLAN}) SELECT id, {COLONNES_PLAN} FROM examens")
+    cur.execute("DELETE FROM plan_modules_precedent")
+    cur.execute("INSERT INTO plan_modules_precedent (module_id, signature) SELECT module_id, signature FROM plan_modules")
+
+def publier_plan_staging(cur):
+    # Bascule examens_staging -> examens dans la transaction de l'appelant :
+    # jusqu'au commit les lecteurs voient l'ancien plan complet, ensuite le nouveau
+    sauvegarder_plan_precedent(cur)
+    cur.execute("DELETE FROM examens")
+    cur.execute(f"INSERT INTO examens ({COLONNES_PLAN}) SELECT {COLONNES_PLAN} FROM examens_staging")
+    cur.execute("DELETE FROM examens_staging")
+
+def reinitialiser_edt():
+    # Vide examens ; le plan effacé reste restaurable
+    conn = get_connection()
+    if not conn:
+        return False
+    
+    cur = conn.cursor()
+    try:
+        sauvegarder_plan_precedent(cur)
+        cur.execute("DELETE FROM examens")
+        apres_ecriture_examens(conn)
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        st.error(f"❌ Erreur réinitialisation : {e}")
+        return False
+    finally:
+        conn.close()
+
+def restaurer_plan_precedent():
+    # Échange examens <-> examens_precedent (examens_staging sert de tampon) :
+    # un second appel revient au plan d'origine, sauf si celui-ci était vide
+    # (restauration après réinitialisation) : rien n'est alors à restaurer
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM examens_precedent")
+        nb_examens = cur.fetchall()[0][0]
+        if not nb_examens:
+            return 0
+        
+        cur.execute("DELETE FROM examens_staging")
+        cur.execute(f"INSERT INTO examens_staging (id, {COLONNES_PLAN}) SELECT id, {COLONNES_PLAN} FROM examens")
+        cur.execute("DELETE FROM examens")
+        cur.execute(f"INSERT INTO examens (id, {COLONNES_PLAN}) SELECT id, {COLONNES_PLAN} FROM examens_precedent")
+        cur.execute("DELETE FROM examens_precedent")
+        cur.execute(f"INSERT INTO examens_precedent (id, {COLONNES_PLAN}) SELECT id, {COLONNES_PLAN} FROM examens_staging")
+        cur.execute("DELETE FROM examens_staging")
+        
+        # Les signatures suivent leur plan : la mise à jour incrémentale
+        # replanifie ce que le plan restauré ne reflète plus
+        cur.execute("SELECT module_id, signature FROM plan_modules")
+        signatures_courantes = cur.fetchall()
+        cur.execute("DELETE FROM plan_modules")
+        cur.execute("INSERT INTO plan_modules (module_id, signature) SELECT module_id, signature FROM plan_modules_precedent")
+        cur.execute("DELETE FROM plan_modules_precedent")
+        inserer_par_lots(cur, "plan_modules_precedent", ["module_id", "signature"], signatures_courantes)
+        apres_ecriture_examens(conn)
+        conn.commit()
+        return nb_examens
+    except Exception as e:
+        conn.rollback()
+        st.error(f"❌ Erreur restauration : {e}")
+        return None
+    finally:
+        conn.close()
+
+def options_planification(mode):
+    return dict(
+        date_debut=DATE_DEBUT, date_fin=DATE_FIN, creneaux=CRENEAUX, duree=DUREE_EXAM,
+        max_salles_par_slot=MAX_SALLES_PER_SLOT, jours_exclus=JOURS_EXCLUS,
+        dates_exclues=DATES_EXCLUES, mode=mode
+    )
+
+def generer_edt_optimiser(mode="glouton", nb_essais=1, graine=0, progression=None):
+    # Aucun appel st.* : tourne dans le thread du job de génération.
+    # progression(fraction, message) est appelée à chaque module ou essai.
     conn = get_connection()
     if not conn:
-        return 0, 0
+        raise RuntimeError("Connexion à la base impossible")
 
     cur = conn.cursor(dictionary=True)
+    signaler = progression or (lambda fraction, message: None)
 
     try:
-        cur.execute("DELETE FROM examens")
+        modules, salles, profs = charger_donnees_planification(cur)
+
+        if not modules or not salles or not profs:
+            raise ValueError("Données insuffisantes")
+
+        inscriptions = get_matrice_inscriptions(get_signature_inscriptions())
+
+        options = options_planification(mode)
+
+        if nb_essais > 1:
+            plan = planifier_multi_depart(
+                modules, salles, profs, inscriptions, nb_essais=nb_essais, graine=graine,
+                progression=lambda termines, total: signaler(termines / total, f"Essais terminés : {termines}/{total}"),
+                **options
+            )
+        else:
+            plan = planifier_examens(
+                modules, salles, profs, inscriptions,
+                progression=lambda i, total, module: signaler((i + 1) / total, f"Planification : {module['module']} ({i+1}/{total})"),
+                **options
+            )
+        exams_to_insert = plan["examens"]
+        signaler(1, "Publication du plan")
+
+        # Le nouveau plan est écrit à part, puis publié d'un bloc : examens
+        # garde l'ancien plan jusque-là, et intact en cas d'échec
+        cur.execute("DELETE FROM examens_staging")
+        inserer_par_lots(cur, "examens_staging",
+                         ["module_id", "prof_id", "lieu_id", "date_heure", "duree_minutes"], exams_to_insert)
+        conn.commit()
+
+        publier_plan_staging(cur)
+        cur.execute("DELETE FROM plan_modules")
+        enregistrer_signatures_plan(cur, inscriptions, [e[0] for e in exams_to_insert])
+        apres_ecriture_examens(conn)
         conn.commit()
 
+        return {"planifies": len(exams_to_insert), "echecs": plan["echecs"],
+                "essai": plan.get("essai"), "score": plan.get("score")}
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        conn.close()
+
+# ==============================
+# GÉNÉRATION EN TÂCHE DE FOND
+# ==============================
+COLONNES_JOB = ["id", "statut", "mode", "nb_essais", "graine", "progression", "message",
+                "nb_planifies", "nb_echecs", "echecs", "erreur", "debut", "maj_le", "fin"]
+
+def get_job_generation():
+    # Dernier job lancé, relu à chaque sondage (pas de cache)
+    result = execute_query(f"""
+        SELECT {', '.join(COLONNES_JOB)}
+        FROM generation_jobs
+        ORDER BY debut DESC
+        LIMIT 1
+    """)
+    return None if result.empty else result.iloc[0].to_dict()
+
+def job_en_cours(job):
+    # Un job sans nouvelles depuis JOB_EXPIRATION_S a perdu son processus
+    return (job is not None and job["statut"] == "en_cours"
+            and job["maj_le"] >= datetime.now() - timedelta(seconds=JOB_EXPIRATION_S))
+
+def reserver_job_generation(mode, nb_essais=None, graine=None, message="En attente du moteur"):
+    # Crée le job en cours ; None si une génération tourne déjà (UNIQUE sur actif)
+    conn = get_connection()
+    if not conn:
+        return None
+    cur = conn.cursor()
+    maintenant = datetime.now()
+    try:
         cur.execute("""
-            SELECT 
-                m.id AS module_id,
-                m.nom AS module,
-                f.id AS formation_id,
-                f.dept_id AS dept_id,
-                COALESCE(COUNT(DISTINCT i.etudiant_id), 1) AS nb_etudiants
-            FROM modules m
-            JOIN formations f ON f.id = m.formation_id
-            LEFT JOIN inscriptions i ON i.module_id = m.id
-            GROUP BY m.id, m.nom, f.id, f.dept_id
-            ORDER BY nb_etudiants DESC
-        """)
-        modules = cur.fetchall()
+            UPDATE generation_jobs SET statut = 'abandonne', actif = NULL, fin = %s
+            WHERE actif = 1 AND maj_le < %s
+        """, (maintenant, maintenant - timedelta(seconds=JOB_EXPIRATION_S)))
+        job_id = uuid.uuid4().hex
+        cur.execute("""
+            INSERT INTO generation_jobs (id, actif, statut, mode, nb_essais, graine, message, debut, maj_le)
+            VALUES (%s, 1, 'en_cours', %s, %s, %s, %s, %s, %s)
+        """, (job_id, mode, nb_essais, graine, message, maintenant, maintenant))
+        conn.commit()
+        return job_id
+    except Exception:
+        conn.rollback()
+        cur.execute("SELECT COUNT(*) FROM generation_jobs WHERE actif = 1")
+        if cur.fetchone()[0]:
+            return None
+        raise
+    finally:
+        conn.close()
 
-        cur.execute("SELECT id, capacite, nom FROM lieux_examen ORDER BY capacite DESC")
-        salles = cur.fetchall()
+def sous_verrou_examens(operation, message, action):
+    # Les autres écritures sur examens (mise à jour incrémentale,
+    # réinitialisation, restauration) prennent le même verrou que la
+    # génération, le temps de l'action ; la ligne est ensuite supprimée
+    job_id = reserver_job_generation(operation, message=message)
+    if job_id is None:
+        st.warning("⚠️ Une génération ou une mise à jour de l'EDT est déjà en cours")
+        return None
+    try:
+        with battement_job(job_id):
+            return action()
+    finally:
+        conn = get_connection()
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("DELETE FROM generation_jobs WHERE id = %s", (job_id,))
+                conn.commit()
+            finally:
+                conn.close()
 
-        cur.execute("SELECT id, nom FROM professeurs")
-        profs = cur.fetchall()
+def mettre_a_jour_job(job_id, **champs):
+    conn = get_connection()
+    if not conn:
+        return
+    champs["maj_le"] = datetime.now()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"UPDATE generation_jobs SET {', '.join(f'{c} = %s' for c in champs)} WHERE id = %s",
+                    (*champs.values(), job_id))
+        conn.commit()
+    finally:
+        conn.close()
 
-        if not modules or not salles or not profs:
-            st.error("❌ Données insuffisantes")
-            return 0, 0
-
-        etudiants_par_module = {}
-        cur.execute("SELECT module_id, etudiant_id FROM inscriptions")
-        for row in cur.fetchall():
-            if row['module_id'] not in etudiants_par_module:
-                etudiants_par_module[row['module_id']] = []
-            etudiants_par_module[row['module_id']].append(row['etudiant_id'])
-
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        formation_jour = {}
-        salle_horaire = {}
-        etudiant_jour = {}
-        prof_horaire = {}
-        salles_occupees_par_slot = {}
-        prof_exams_count = {p["id"]: 0 for p in profs}
-
-        success = 0
-        failed = 0
-        failed_modules = []
-        exams_to_insert = []
-
-        for i, module in enumerate(modules):
-            progress = (i + 1) / len(modules)
-            progress_bar.progress(progress)
-            status_text.text(f"⏳ Planification: {module['module']} ({i+1}/{len(modules)})")
-
-            planifie = False
-            etudiants_module = etudiants_par_module.get(module["module_id"], [])
-
-            start_idx = i % len(CRENEAUX)
-            creneaux_priority = CRENEAUX[start_idx:] + CRENEAUX[:start_idx]
-
-            for jour_offset in range((DATE_FIN - DATE_DEBUT).days + 1):
-                if planifie:
-                    break
-                    
-                date_exam = (DATE_DEBUT + timedelta(days=jour_offset)).date()
-
-                if (module["formation_id"], date_exam) in formation_jour:
-                    continue
-
-                for heure in creneaux_priority:
-                    if planifie:
-                        break
-                        
-                    dt = datetime.strptime(f"{date_exam} {heure}", "%Y-%m-%d %H:%M")
-
-                    if salles_occupees_par_slot.get(dt, 0) >= MAX_SALLES_PER_SLOT:
-                        continue
-
-                    if any((etud_id, date_exam) in etudiant_jour for etud_id in etudiants_module):
-                        continue
-
-                    for salle in salles:
-                        if planifie:
-                            break
-
-                        if salle["capacite"] < module["nb_etudiants"]:
-                            continue
-
-                        if (salle["id"], dt) in salle_horaire:
-                            continue
-
-                        prof_disponible = None
-                        profs_tries = sorted(profs, key=lambda p: prof_exams_count[p["id"]])
-                        
-                        for p in profs_tries:
-                            if (p["id"], dt) not in prof_horaire:
-                                prof_disponible = p
-                                break
-                        
-                        if not prof_disponible:
-                            continue
-
-                        exams_to_insert.append((
-                            module["module_id"],
-                            prof_disponible["id"],
-                            salle["id"],
-                            dt,
-                            DUREE_EXAM
-                        ))
-
-                        salle_horaire[(salle["id"], dt)] = True
-                        prof_horaire[(prof_disponible["id"], dt)] = True
-                        formation_jour[(module["formation_id"], date_exam)] = True
-                        salles_occupees_par_slot[dt] = salles_occupees_par_slot.get(dt, 0) + 1
-                        prof_exams_count[prof_disponible["id"]] += 1
-                        
-                        for etud_id in etudiants_module:
-                            etudiant_jour[(etud_id, date_exam)] = True
-
-                        success += 1
-                        planifie = True
-
-            if not planifie:
-                failed += 1
-                failed_modules.append(module["module"])
-
-        if exams_to_insert:
-            cur.executemany("""
-                INSERT INTO examens (module_id, prof_id, lieu_id, date_heure, duree_minutes)
-                VALUES (%s, %s, %s, %s, %s)
-            """, exams_to_insert)
-            conn.commit()
+@contextmanager
+def battement_job(job_id):
+    # Tant que le bloc tourne, maj_le avance toutes les JOB_BATTEMENT_S (y
+    # compris pendant la publication ou un long essai multi-départ) : seul un
+    # job dont le processus a disparu atteint JOB_EXPIRATION_S
+    arret = threading.Event()
+
+    def battre():
+        while not arret.wait(JOB_BATTEMENT_S):
+            try:
+                mettre_a_jour_job(job_id)
+            except Exception:
+                pass   # base occupée : rattrapé au battement suivant
+
+    thread = threading.Thread(target=battre, name=f"battement-{job_id[:8]}", daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
+    try:
+        yield
+    finally:
+        arret.set()
+        thread.join()
+
+def executer_job_generation(job_id, mode, nb_essais, graine):
+    # Corps du thread : la progression n'est écrite qu'une fois par
+    # JOB_PROGRESSION_S, la page admin la relit par sondage
+    derniere_ecriture = [0.0]
 
-        progress_bar.empty()
-        status_text.empty()
+    def progression(fraction, message):
+        maintenant = time.monotonic()
+        if fraction >= 1 or maintenant - derniere_ecriture[0] >= JOB_PROGRESSION_S:
+            derniere_ecriture[0] = maintenant
+            mettre_a_jour_job(job_id, progression=fraction, message=message)
 
-        if failed_modules:
+    try:
+        with battement_job(job_id):
+            resultat = generer_edt_optimiser(mode, nb_essais, graine, progression)
+        message = (f"Meilleur essai : n°{resultat['essai']} (score {resultat['score']})"
+                   if resultat["essai"] is not None else "Génération terminée")
+        mettre_a_jour_job(job_id, statut="termine", actif=None, progression=1, message=message,
+                          nb_planifies=resultat["planifies"], nb_echecs=len(resultat["echecs"]),
+                          echecs="\n".join(resultat["echecs"][:20]), fin=datetime.now())
+    except Exception as e:
+        mettre_a_jour_job(job_id, statut="echec", actif=None, message=str(e)[:255],
+                          erreur=traceback.format_exc(), fin=datetime.now())
+    finally:
+        signaler_ecriture_examens()
+
+def lancer_generation(mode, nb_essais, graine):
+    job_id = reserver_job_generation(mode, nb_essais, graine)
+    if job_id is None:
+        return None
+    thread = threading.Thread(target=executer_job_generation, args=(job_id, mode, nb_essais, graine),
+                              name=f"generation-{job_id[:8]}", daemon=True)
+    # Accès aux caches st.cache_* depuis le thread
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
+    return job_id
+
+@st.fragment(run_every=JOB_POLL_S)
+def suivi_generation():
+    job = get_job_generation()
+    if not job_en_cours(job):
+        # Job terminé : toute la page se recharge sur le nouveau plan
+        st.rerun()
+    st.progress(min(float(job["progression"]), 1.0), text=f"⏳ {job['message']}")
+
+def afficher_job_generation(job):
+    if job is None:
+        return
+    if job_en_cours(job):
+        suivi_generation()
+    elif job["statut"] == "termine":
+        success, failed = int(job["nb_planifies"]), int(job["nb_echecs"])
+        total = success + failed
+        taux = (success / total * 100) if total > 0 else 0
+        elapsed = (job["fin"] - job["debut"]).total_seconds()
+        st.success(f"✅ Dernière génération : {success}/{total} modules planifiés ({taux:.1f}%) "
+                   f"en {elapsed:.2f}s — {job['message']}")
+        if failed > 0:
             with st.expander(f"⚠️ Modules non planifiés ({failed})"):
-                for mod in failed_modules[:20]:
+                for mod in job["echecs"].split("\n"):
                     st.write(f"- {mod}")
                 if failed > 20:
                     st.write(f"... et {failed - 20} autres")
+    elif job["statut"] == "echec":
+        st.error(f"❌ Erreur génération : {job['message']}")
+        with st.expander("Détails"):
+            st.code(job["erreur"])
+    else:
+        st.warning("⚠️ La dernière génération a été interrompue (aucune nouvelle du processus)")
+
+def replanifier_incremental(mode="glouton"):
+    # Ne replanifie que les modules dont les inscriptions, la salle, le
+    # surveillant ou le créneau ne sont plus valides ; le reste est conservé.
+    conn = get_connection()
+    if not conn:
+        return None
+
+    cur = conn.cursor(dictionary=True)
+
+    try:
+        modules, salles, profs = charger_donnees_planification(cur)
+        if not modules or not salles or not profs:
+            st.error("❌ Données insuffisantes")
+            return None
+
+        cur.execute("""
+            SELECT e.id, e.module_id, m.formation_id, e.prof_id, e.lieu_id, e.date_heure
+            FROM examens e
+            JOIN modules m ON m.id = e.module_id
+        """)
+        examens = cur.fetchall()
+
+        cur.execute("SELECT module_id, signature FROM plan_modules")
+        signatures_plan = {row["module_id"]: row["signature"] for row in cur.fetchall()}
+
+        inscriptions = get_matrice_inscriptions(get_signature_inscriptions())
+        signatures = inscriptions.signatures()
+        calendrier = Calendrier(DATE_DEBUT, DATE_FIN, CRENEAUX, JOURS_EXCLUS, DATES_EXCLUES)
+        modules_par_id = {m["module_id"]: m for m in modules}
+        capacites = {s["id"]: s["capacite"] for s in salles}
+        prof_ids = {p["id"] for p in profs}
+
+        fixes = []
+        a_supprimer = []
+        for examen in examens:
+            module = modules_par_id.get(examen["module_id"])
+            inchange = (
+                module is not None
+                and signatures_plan.get(examen["module_id"]) == signatures.get(examen["module_id"], 0)
+                and capacites.get(examen["lieu_id"], 0) >= module["nb_etudiants"]
+                and examen["prof_id"] in prof_ids
+                and examen["date_heure"] in calendrier.index
+            )
+            if inchange:
+                fixes.append(examen)
+            else:
+                a_supprimer.append(examen["id"])
+
+        deja_planifies = {e["module_id"] for e in fixes}
+        a_planifier = [m for m in modules if m["module_id"] not in deja_planifies]
+
+        plan = planifier_examens(
+            a_planifier, salles, profs, inscriptions,
+            examens_fixes=fixes, **options_planification(mode)
+        )
 
-        return success, failed
+        sauvegarder_plan_precedent(cur)
+        if a_supprimer:
+            cur.executemany("DELETE FROM examens WHERE id = %s", [(i,) for i in a_supprimer])
+        if plan["examens"]:
+            cur.executemany("""
+                INSERT INTO examens (module_id, prof_id, lieu_id, date_heure, duree_minutes)
+                VALUES (%s, %s, %s, %s, %s)
+            """, plan["examens"])
+            enregistrer_signatures_plan(cur, inscriptions, [e[0] for e in plan["examens"]])
+        apres_ecriture_examens(conn)
+        conn.commit()
+
+        return {
+            "conserves": len(fixes),
+            "replanifies": len(plan["examens"]),
+            "echecs": plan["echecs"],
+        }
 
     except Exception as e:
         conn.rollback()
-        st.error(f"❌ Erreur génération : {e}")
-        import traceback
-        st.error(traceback.format_exc())
-        return 0, 0
+        st.error(f"❌ Erreur mise à jour incrémentale : {e}")
+        return None
 
     finally:
         conn.close()
 
+# ==============================
+# RENDU GROUPÉ
+# ==============================
+def tableau_html(lignes, colonnes):
+    # Un seul élément pour tout un groupe d'examens, au lieu de widgets par ligne
+    table = lignes[list(colonnes)].rename(columns=colonnes)
+    return table.to_html(index=False, border=0, classes="table-examens", escape=True)
+
+def afficher_groupes(edt, groupe, colonnes, titre, cle, ouverts=1):
+    """Une section repliable par valeur de `groupe` (formation, jour...).
+
+    - colonnes : {colonne: en-tête} du tableau de chaque section
+    - titre : libellé de la section à partir de la valeur du groupe
+    - ouverts : nombre de sections ouvertes au premier affichage ; le
+      tableau d'une section fermée n'est pas construit
+    """
+    for rang, (valeur, lignes) in enumerate(edt.groupby(groupe, sort=True)):
+        section = st.expander(f"{titre(valeur)} — {len(lignes)} examen(s)", expanded=rang < ouverts,
+                              key=f"{cle}_{valeur}", on_change="rerun")
+        if section.open:
+            section.markdown(tableau_html(lignes, colonnes), unsafe_allow_html=True)
+
 # ==============================
 # PAGE CONNEXION
 # ==============================
@@ -543,25 +1133,31 @@ def page_connexion():
         elif role == ROLES["enseignant"]:
             profs = get_professeurs_by_dept()
             if not profs.empty:
-                prof_nom = st.selectbox("Sélectionnez votre nom", profs["nom"].tolist())
+                # Sélection par id : deux enseignants peuvent porter le même nom
+                noms_profs = dict(zip(profs["id"].tolist(), profs["nom"].tolist()))
+                prof_id = st.selectbox("Sélectionnez votre nom", list(noms_profs), format_func=noms_profs.get)
                 
                 if st.button("Se connecter", use_container_width=True):
-                    prof_data = profs[profs["nom"] == prof_nom].iloc[0]
+                    prof_data = profs[profs["id"] == prof_id].iloc[0]
                     st.session_state.user_role = "enseignant"
-                    st.session_state.user_name = prof_nom
+                    st.session_state.user_name = noms_profs[prof_id]
                     st.session_state.user_dept_id = prof_data["dept_id"]
+                    st.session_state.user_prof_id = prof_id
                     st.rerun()
         
         elif role == ROLES["etudiant"]:
-            formations = get_formations_by_dept()
-            if not formations.empty:
-                formation_nom = st.selectbox("Formation", formations["nom"].tolist())
-                
-                if st.button("Se connecter", use_container_width=True):
-                    formation_data = formations[formations["nom"] == formation_nom].iloc[0]
+            etudiant_id = st.number_input("Numéro étudiant", min_value=1, step=1)
+            
+            if st.button("Se connecter", use_container_width=True):
+                etudiant = get_etudiant(int(etudiant_id))
+                if etudiant.empty:
+                    st.error("❌ Numéro étudiant inconnu")
+                else:
+                    etudiant = etudiant.iloc[0]
                     st.session_state.user_role = "etudiant"
-                    st.session_state.user_name = "Étudiant"
-                    st.session_state.user_dept_id = formation_data["dept_id"]
+                    st.session_state.user_name = f"{etudiant['prenom'] or ''} {etudiant['nom']}".strip()
+                    st.session_state.user_dept_id = etudiant["dept_id"]
+                    st.session_state.user_etudiant_id = int(etudiant_id)
                     st.rerun()
 
 # ==============================
@@ -570,7 +1166,7 @@ def page_connexion():
 def dashboard_vice_doyen():
     st.markdown(f'<div class="main-header"><h1>📊 Vue Stratégique Globale</h1><div class="role-badge">{ROLES["vice_doyen"]} - {st.session_state.user_name}</div></div>', unsafe_allow_html=True)
     
-    kpis = get_kpis_globaux()
+    kpis = get_kpis_globaux(get_version_edt())
     
     st.markdown("### 📈 Indicateurs Clés de Performance")
     col1, col2, col3, col4 = st.columns(4)
@@ -592,12 +1188,12 @@ def dashboard_vice_doyen():
     
     with col4:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("🎓 Étudiants", 13000)
+        st.metric("🎓 Étudiants", int(kpis["nb_etudiants"]))
         st.markdown('</div>', unsafe_allow_html=True)
     
     st.divider()
     
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         st.markdown('<div class="kpi-container">', unsafe_allow_html=True)
@@ -609,10 +1205,15 @@ def dashboard_vice_doyen():
         st.metric("⚠️ Conflits Professeurs", int(kpis["nb_conflits_profs"]))
         st.markdown('</div>', unsafe_allow_html=True)
     
+    with col3:
+        st.markdown('<div class="kpi-container">', unsafe_allow_html=True)
+        st.metric("⚠️ Conflits Étudiants", int(kpis["nb_conflits_etudiants"]))
+        st.markdown('</div>', unsafe_allow_html=True)
+    
     st.divider()
     
     st.markdown("### 🏢 Occupation Globale des Salles")
-    occupation = get_occupation_globale()
+    occupation = get_occupation_globale(get_version_edt())
     
     if not occupation.empty:
         fig = px.bar(
@@ -629,7 +1230,7 @@ def dashboard_vice_doyen():
     st.divider()
     
     st.markdown("### 📊 Statistiques par Département")
-    stats_dept = get_stats_par_departement()
+    stats_dept = get_stats_par_departement(get_version_edt())
     
     if not stats_dept.empty:
         fig = px.bar(stats_dept, x="departement", y="nb_examens", title="Examens par Département")
@@ -639,7 +1240,7 @@ def dashboard_vice_doyen():
     st.divider()
     
     st.markdown("### ⏰ Charge de Travail Professeurs")
-    heures = get_heures_enseignement()
+    heures = get_heures_enseignement(get_version_edt())
     
     if not heures.empty:
         fig = px.scatter(heures, x="nb_examens", y="heures_totales", size="nb_surveillances", 
@@ -653,7 +1254,7 @@ def dashboard_vice_doyen():
     st.divider()
     
     st.markdown("### 📅 Surveillances des Professeurs par Jour")
-    surveillances = get_surveillances_par_jour()
+    surveillances = get_surveillances_par_jour(get_version_edt())
     
     if not surveillances.empty:
         fig = px.bar(surveillances, x="date", y="nb_examens_jour", color="departement",
@@ -664,68 +1265,190 @@ def dashboard_vice_doyen():
     else:
         st.info("Aucune donnée de surveillance disponible")
 
+def chemin_instantane(nom):
+    # Un simple nom de fichier .db, toujours dans DOSSIER_INSTANTANES
+    if not re.fullmatch(r"[\w-]+\.db", nom.strip()):
+        raise ValueError("Nom invalide : lettres, chiffres, _ ou - suivis de .db, sans dossier")
+    return os.path.join(DOSSIER_INSTANTANES, nom.strip())
+
 def dashboard_admin_examens():
     st.markdown(f'<div class="main-header"><h1>🛠️ Administration et Planification</h1><div class="role-badge">{ROLES["admin_exams"]} - {st.session_state.user_name}</div></div>', unsafe_allow_html=True)
     
     st.markdown("### ⚙️ Actions de Planification")
     
-    col1, col2, col3 = st.columns(3)
+    mode = st.radio(
+        "Algorithme de planification",
+        list(MODES_PLANIFICATION),
+        format_func=MODES_PLANIFICATION.get,
+        horizontal=True
+    )
+    
+    col1, col2 = st.columns(2)
+    nb_essais = col1.number_input("Essais en parallèle (multi-départ)", min_value=1, max_value=64, value=1,
+                                  help="Plusieurs générations perturbées sur tous les cœurs ; seule la meilleure est enregistrée")
+    graine = col2.number_input("Graine aléatoire", min_value=0, value=0, step=1)
+    
+    job = get_job_generation()
+    en_cours = job_en_cours(job)
+    
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        if st.button("🚀 Générer EDT Complet", use_container_width=True):
-            with st.spinner("⏳ Génération en cours..."):
-                import time
-                start = time.time()
-                success, failed = generer_edt_optimiser()
-                elapsed = time.time() - start
-                
-                total = success + failed
-                taux = (success / total * 100) if total > 0 else 0
-                
-                st.success(f"✅ {success}/{total} modules planifiés ({taux:.1f}%) en {elapsed:.2f}s")
-                
-                if failed > 0:
-                    st.warning(f"⚠️ {failed} modules non planifiés")
-                else:
-                    st.balloons()
-                    
-                st.cache_data.clear()
+        if st.button("🚀 Générer EDT Complet", use_container_width=True, disabled=en_cours):
+            # La génération tourne dans un thread ; la page suit le job par sondage
+            if lancer_generation(mode, int(nb_essais), int(graine)) is None:
+                st.warning("⚠️ Une génération est déjà en cours")
+            else:
                 st.rerun()
     
     with col2:
         if st.button("🔄 Actualiser Données", use_container_width=True):
-            st.cache_data.clear()
+            # Référentiels + relecture immédiate de la version de l'EDT
+            for cache in (get_departements, get_formations_by_dept, get_professeurs_by_dept, get_salles, get_version_edt):
+                cache.clear()
             st.success("✅ Données actualisées")
             st.rerun()
     
+    with col4:
+        if st.button("⚡ Mise à jour incrémentale", use_container_width=True, disabled=en_cours,
+                     help="Replanifie uniquement les modules dont les inscriptions, la salle ou le surveillant ont changé"):
+            start = time.time()
+            resultat = sous_verrou_examens("incremental", "Mise à jour incrémentale en cours",
+                                           lambda: replanifier_incremental(mode))
+            elapsed = time.time() - start
+            
+            if resultat is not None:
+                st.success(f"✅ {resultat['replanifies']} modules replanifiés, "
+                           f"{resultat['conserves']} examens conservés en {elapsed:.2f}s")
+                if resultat["echecs"]:
+                    st.warning(f"⚠️ {len(resultat['echecs'])} modules non planifiés")
+                signaler_ecriture_examens()
+    
     with col3:
-        if st.button("🗑️ Réinitialiser EDT", use_container_width=True):
-            conn = get_connection()
-            if conn:
-                cur = conn.cursor()
-                cur.execute("DELETE FROM examens")
-                conn.commit()
-                conn.close()
+        if st.button("🗑️ Réinitialiser EDT", use_container_width=True, disabled=en_cours):
+            if sous_verrou_examens("reinitialisation", "Réinitialisation en cours", reinitialiser_edt):
                 st.success("✅ EDT réinitialisé")
-                st.cache_data.clear()
+                signaler_ecriture_examens()
                 st.rerun()
+        
+        if st.button("↩️ Restaurer le plan précédent", use_container_width=True, disabled=en_cours,
+                     help="Revient au plan publié avant la dernière génération, mise à jour ou réinitialisation"):
+            restaures = sous_verrou_examens("restauration", "Restauration en cours", restaurer_plan_precedent)
+            if restaures == 0:
+                st.info("Aucun plan précédent à restaurer")
+            elif restaures:
+                st.success(f"✅ {restaures} examens restaurés")
+                signaler_ecriture_examens()
+    
+    afficher_job_generation(job)
+    
+    kpis = get_kpis_globaux(get_version_edt())
+    nb_conflits = int(kpis["nb_conflits_salles"] + kpis["nb_conflits_profs"] + kpis["nb_conflits_etudiants"])
+    with st.expander(f"🔍 Rapport de validation ({nb_conflits} conflits)", expanded=nb_conflits > 0):
+        if nb_conflits == 0:
+            st.success("✅ Aucun chevauchement de salle, de surveillant ou d'étudiant")
+        else:
+            rapport = get_rapport_conflits(get_version_edt())
+            for cle, titre in (("salles", "🏫 Salles"), ("profs", "👨‍🏫 Professeurs"), ("etudiants", "🎓 Étudiants")):
+                if cle in rapport and not rapport[cle].empty:
+                    st.markdown(f"**{titre}** : {len(rapport[cle])} paires d'examens")
+                    st.dataframe(rapport[cle], use_container_width=True)
+    
+    with st.expander("💾 Instantané SQLite du planning publié"):
+        nom_snapshot = st.text_input("Nom de l'instantané", SNAPSHOT_SQLITE,
+                                     help=f"Fichier .db écrit dans {DOSSIER_INSTANTANES}")
+        if st.button("Créer l'instantané"):
+            with st.spinner("⏳ Copie des tables..."):
+                try:
+                    chemin_snapshot = chemin_instantane(nom_snapshot)
+                    os.makedirs(DOSSIER_INSTANTANES, exist_ok=True)
+                    copier_vers_sqlite(get_backend(), chemin_snapshot)
+                    st.success(f"✅ Instantané écrit dans {chemin_snapshot}")
+                    st.code(f"EXAMENS_SQLITE={chemin_snapshot} EXAMENS_SQLITE_LECTURE_SEULE=1 streamlit run dashboard.py",
+                            language="bash")
+                except Exception as e:
+                    st.error(f"❌ Erreur instantané : {e}")
+    
+    with st.expander("📈 Diagnostics de performance"):
+        # Mesures de ce processus : reruns, requêtes SQL, caches st.cache_data
+        mesures = DIAGNOSTICS.instantane()
+        st.caption(f"Depuis le {mesures['depuis']} (processus courant)")
+        for cle, titre in (("reruns", "⏱️ Reruns par tableau de bord"), ("requetes", "🗄️ Requêtes (par temps total)"),
+                           ("caches", "🧠 Caches st.cache_data")):
+            st.markdown(f"**{titre}**")
+            st.dataframe(pd.DataFrame(mesures[cle]), use_container_width=True, hide_index=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("📥 Exporter en JSON", DIAGNOSTICS.exporter_json,
+                             f"diagnostics_{datetime.now():%Y%m%d_%H%M}.json", "application/json",
+                             use_container_width=True)
+        if col2.button("♻️ Remettre à zéro", use_container_width=True):
+            DIAGNOSTICS.reinitialiser()
+            st.rerun()
     
     st.divider()
     
     st.markdown("### 📋 Emploi du Temps Complet")
     
-    edt = load_edt_complete()
+    with st.expander("🔎 Filtres"):
+        departements = get_departements()
+        noms_depts = dict(zip(departements["id"].tolist(), departements["nom"].tolist()))
+        col1, col2, col3 = st.columns(3)
+        dept_id = col1.selectbox("Département", [None] + list(noms_depts),
+                                 format_func=lambda i: noms_depts.get(i, "Tous"))
+        
+        formations = get_formations_by_dept(dept_id)
+        noms_formations = dict(zip(formations["id"].tolist(), formations["nom"].tolist()))
+        formation_id = col2.selectbox("Formation", [None] + list(noms_formations),
+                                      format_func=lambda i: noms_formations.get(i, "Toutes"))
+        
+        salles = get_salles()
+        noms_salles = dict(zip(salles["id"].tolist(), salles["nom"].tolist()))
+        lieu_id = col3.selectbox("Salle", [None] + list(noms_salles),
+                                 format_func=lambda i: noms_salles.get(i, "Toutes"))
+        
+        col1, col2, col3 = st.columns(3)
+        profs = get_professeurs_by_dept(dept_id)
+        noms_profs = dict(zip(profs["id"].tolist(), profs["nom"].tolist()))
+        prof_id = col1.selectbox("Professeur", [None] + list(noms_profs),
+                                 format_func=lambda i: noms_profs.get(i, "Tous"))
+        date_debut = col2.date_input("Du", value=None)
+        date_fin = col3.date_input("Au", value=None)
+        recherche = st.text_input("Recherche (module, formation, professeur, salle)").strip()
+    
+    filtres = {"dept_id": dept_id, "formation_id": formation_id, "lieu_id": lieu_id, "prof_id": prof_id,
+               "date_debut": date_debut, "date_fin": date_fin, "recherche": recherche}
+    if st.session_state.get("edt_filtres") != filtres:
+        # Nouveaux filtres : retour à la première page
+        st.session_state.edt_filtres = filtres
+        st.session_state.edt_curseurs = [None]
+    
+    version = get_version_edt()
+    totaux = compter_edt(version, filtres)
     
-    if not edt.empty:
+    if totaux["nb_examens"] > 0:
         col1, col2, col3 = st.columns(3)
-        col1.metric("Total Examens", len(edt))
-        col2.metric("Départements", edt["departement"].nunique())
-        col3.metric("Formations", edt["formation"].nunique())
+        col1.metric("Total Examens", totaux["nb_examens"])
+        col2.metric("Départements", totaux["nb_departements"])
+        col3.metric("Formations", totaux["nb_formations"])
         
-        st.dataframe(edt, use_container_width=True
+        curseurs = st.session_state.edt_curseurs
+        page = page_edt(version, filtres, curseurs[-1])
+        st.dataframe(page, use_container_width=True, height=400)
         
-        csv = edt.to_csv(index=False).encode('utf-8')
-        st.download_button("📥 Télécharger CSV", csv, "edt_complet.csv", "text/csv")
+        nb_pages = -(-totaux["nb_examens"] // TAILLE_PAGE_EDT)
+        col1, col2, col3 = st.columns([1, 2, 1])
+        if col1.button("◀ Précédent", disabled=len(curseurs) == 1, use_container_width=True):
+            curseurs.pop()
+            st.rerun()
+        col2.caption(f"Page {len(curseurs)} / {nb_pages}")
+        if col3.button("Suivant ▶", disabled=len(curseurs) >= nb_pages or len(page) < TAILLE_PAGE_EDT,
+                       use_container_width=True):
+            dernier = page.iloc[-1]
+            curseurs.append((pd.Timestamp(dernier["date_heure"]).to_pydatetime(), int(dernier["id"])))
+            st.rerun()
+        
+        st.markdown("#### 📥 Exporter la sélection")
+        boutons_export(filtres, "edt_complet", "EDT Examens")
     else:
         st.info("Aucun examen planifié")
 
@@ -733,7 +1456,7 @@ def dashboard_chef_dept():
     st.markdown(f'<div class="main-header"><h1>📂 Gestion Département</h1><div class="role-badge">{ROLES["chef_dept"]} - {st.session_state.user_name}</div></div>', unsafe_allow_html=True)
     
     dept_id = st.session_state.user_dept_id
-    edt_dept = load_edt_complete(dept_id=dept_id)
+    edt_dept = load_edt_complete(get_version_edt(), dept_id=dept_id)
     
     if not edt_dept.empty:
         st.markdown(f'<div class="dept-section">🏢 Département : {edt_dept.iloc[0]["departement"]}</div>', unsafe_allow_html=True)
@@ -747,16 +1470,12 @@ def dashboard_chef_dept():
         
         st.markdown("### ✅ Examens par Formation")
         
-        for formation in edt_dept["formation"].unique():
-            st.markdown(f"#### 📚 {formation}")
-            formation_data = edt_dept[edt_dept["formation"] == formation]
-            
-            for _, exam in formation_data.iterrows():
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.write(f"**{exam['module']}**")
-                    st.write(f"📅 {exam['date_heure']} | 🏫 {exam['salle']} | 👨‍🏫 {exam['professeur']}")
-                st.divider()
+        edt_dept["horaire"] = pd.to_datetime(edt_dept["date_heure"]).dt.strftime("%d/%m/%Y %H:%M")
+        afficher_groupes(
+            edt_dept, "formation",
+            {"module": "Module", "horaire": "📅 Date", "salle": "🏫 Salle", "professeur": "👨‍🏫 Surveillant"},
+            titre=lambda formation: f"📚 {formation}", cle="chef_formation"
+        )
         
         st.divider()
         
@@ -779,22 +1498,7 @@ def dashboard_chef_dept():
 def dashboard_enseignant():
     st.markdown(f'<div class="main-header"><h1>👨‍🏫 Mon Planning</h1><div class="role-badge">{ROLES["enseignant"]} - {st.session_state.user_name}</div></div>', unsafe_allow_html=True)
     
-    query = """
-    SELECT e.id, m.nom AS module, f.nom AS formation, d.nom AS departement,
-           l.nom AS salle, e.date_heure, COUNT(DISTINCT i.etudiant_id) AS nb_inscrits
-    FROM examens e
-    JOIN modules m ON m.id = e.module_id
-    JOIN formations f ON f.id = m.formation_id
-    JOIN departements d ON d.id = f.dept_id
-    JOIN lieux_examen l ON l.id = e.lieu_id
-    JOIN professeurs p ON p.id = e.prof_id
-    LEFT JOIN inscriptions i ON i.module_id = m.id
-    WHERE p.nom = %s
-    GROUP BY e.id, m.nom, f.nom, d.nom, l.nom, e.date_heure
-    ORDER BY e.date_heure
-    """
-    
-    mes_examens = execute_query(query, params=(st.session_state.user_name,))
+    mes_examens = get_planning_enseignant(get_version_edt(), st.session_state.user_prof_id)
     
     if not mes_examens.empty:
         st.metric("📘 Mes Examens à Surveiller", len(mes_examens))
@@ -802,75 +1506,65 @@ def dashboard_enseignant():
         
         st.markdown("### 📅 Planning de Mes Examens")
         
-        for _, exam in mes_examens.iterrows():
-            st.markdown(f'<div class="validation-box">', unsafe_allow_html=True)
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                st.markdown(f"#### 📖 {exam['module']}")
-                st.write(f"**Formation:** {exam['formation']} ({exam['departement']})")
-                st.write(f"📅 **Date:** {exam['date_heure']}")
-                st.write(f"🏫 **Salle:** {exam['salle']}")
-            
-            with col2:
-                st.metric("👥 Inscrits", int(exam['nb_inscrits']))
-            
-            st.markdown('</div>', unsafe_allow_html=True)
+        dates = pd.to_datetime(mes_examens["date_heure"])
+        mes_examens["date"] = dates.dt.date
+        mes_examens["heure"] = dates.dt.strftime("%H:%M")
+        mes_examens["formation"] = mes_examens["formation"] + " (" + mes_examens["departement"] + ")"
+        afficher_groupes(
+            mes_examens, "date",
+            {"heure": "⏰ Heure", "module": "📖 Module", "formation": "Formation", "salle": "🏫 Salle",
+             "nb_inscrits": "👥 Inscrits"},
+            titre=lambda date: f"📅 {date.strftime('%A %d %B %Y')}", cle="enseignant",
+            ouverts=len(mes_examens)
+        )
+        
+        st.markdown("#### 📥 Télécharger Mon Planning")
+        boutons_export({"prof_id": st.session_state.user_prof_id}, "mon_planning",
+                       f"Surveillances {st.session_state.user_name}", formats=("csv", "ics"))
     else:
         st.info("Aucun examen planifié pour le moment")
 
 def dashboard_etudiant():
     st.markdown(f'<div class="main-header"><h1>🎓 Mon Calendrier d\'Examens</h1><div class="role-badge">{ROLES["etudiant"]} - {st.session_state.user_name}</div></div>', unsafe_allow_html=True)
     
-    formations = get_formations_by_dept(st.session_state.user_dept_id)
+    etudiant_id = st.session_state.user_etudiant_id
+    mes_examens = get_edt_etudiant(get_version_edt(), etudiant_id)
     
-    if not formations.empty:
-        formation_selected = st.selectbox("Ma Formation", formations["nom"].tolist())
-        formation_id = formations[formations["nom"] == formation_selected]["id"].values[0]
-        
+    if not mes_examens.empty:
+        st.metric("📘 Mes Examens", len(mes_examens))
         st.divider()
         
-        edt_formation = get_edt_etudiant(formation_id)
+        st.markdown("### 📅 Calendrier de Mes Examens")
         
-        if not edt_formation.empty:
-            st.metric("📘 Mes Examens", len(edt_formation))
-            st.divider()
-            
-            st.markdown("### 📅 Calendrier de Mes Examens")
-            
-            edt_formation["date"] = pd.to_datetime(edt_formation["date_heure"]).dt.date
-            
-            for date in sorted(edt_formation["date"].unique()):
-                st.markdown(f"#### 📅 {date.strftime('%A %d %B %Y')}")
-                examens_jour = edt_formation[edt_formation["date"] == date]
-                
-                for _, exam in examens_jour.iterrows():
-                    st.markdown(f'<div class="validation-box">', unsafe_allow_html=True)
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.write(f"**⏰ {exam['date_heure'].strftime('%H:%M')}**")
-                        st.write(f"📖 {exam['module']}")
-                    
-                    with col2:
-                        st.write(f"🏫 Salle: {exam['salle']}")
-                        st.write(f"👨‍🏫 Prof: {exam['professeur']}")
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
-                
-                st.divider()
-            
-            csv = edt_formation.to_csv(index=False).encode('utf-8')
-            st.download_button("📥 Télécharger Mon Calendrier", csv, "mes_examens.csv", "text/csv")
-        else:
-            st.info("Aucun examen planifié pour cette formation")
+        dates = pd.to_datetime(mes_examens["date_heure"])
+        mes_examens["date"] = dates.dt.date
+        mes_examens["heure"] = dates.dt.strftime("%H:%M")
+        afficher_groupes(
+            mes_examens, "date",
+            {"heure": "⏰ Heure", "module": "📖 Module", "formation": "📚 Formation", "salle": "🏫 Salle",
+             "professeur": "👨‍🏫 Prof"},
+            titre=lambda date: f"📅 {date.strftime('%A %d %B %Y')}", cle="etudiant",
+            ouverts=len(mes_examens)
+        )
+        
+        st.markdown("#### 📥 Télécharger Mon Calendrier")
+        boutons_export({"etudiant_id": etudiant_id}, "mes_examens",
+                       f"Examens {st.session_state.user_name}", formats=("csv", "ics"))
     else:
-        st.warning("Aucune formation disponible")
+        st.info("Aucun examen planifié pour vos modules")
 
 # ==============================
 # NAVIGATION PRINCIPALE
 # ==============================
 def main():
+    # Durée totale du rerun, comptée par tableau de bord
+    with DIAGNOSTICS.mesurer_rerun(st.session_state.user_role or "connexion"):
+        afficher_page()
+
+def afficher_page():
+    initialiser_base()
+    synchroniser_inscriptions()
+    
     with st.sidebar:
         if st.session_state.user_role:
             st.markdown(f"### 👤 Connecté en tant que:")
@@ -883,6 +1577,8 @@ def main():
                 st.session_state.user_role = None
                 st.session_state.user_name = None
                 st.session_state.user_dept_id = None
+                st.session_state.user_prof_id = None
+                st.session_state.user_etudiant_id = None
                 st.rerun()
     
     if not st.session_state.user_role:
@@ -0,0 +1,529 @@
+"""Couche d'accès aux données : MySQL (production) ou SQLite embarqué.
+
+Les deux backends exposent la même interface : `connecter()` renvoie une
+connexion DB-API dont `cursor(dictionary=True)` et les paramètres `%s`
+fonctionnent à l'identique, et quelques fragments SQL propres au
+dialecte (GROUP_CONCAT, format d'heure).
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+SCHEMA_SQLITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema_sqlite.sql")
+
+TABLES = ["departements", "formations", "modules", "etudiants", "inscriptions",
+          "lieux_examen", "professeurs", "examens", "surveillances"]
+
+# Tables dérivées maintenues par l'application (DDL valable MySQL et SQLite)
+TABLES_AUXILIAIRES = {
+    # Signature des inscriptions de chaque module au moment où il a été planifié
+    "plan_modules": """
+        CREATE TABLE IF NOT EXISTS plan_modules (
+            module_id INT PRIMARY KEY,
+            signature BIGINT NOT NULL
+        )
+    """,
+    # Signatures du plan remplacé, restaurées avec examens_precedent
+    "plan_modules_precedent": """
+        CREATE TABLE IF NOT EXISTS plan_modules_precedent (
+            module_id INT PRIMARY KEY,
+            signature BIGINT NOT NULL
+        )
+    """,
+    # Plan en cours de génération, publié dans examens en une transaction
+    "examens_staging": """
+        CREATE TABLE IF NOT EXISTS examens_staging (
+            id INT,
+            module_id INT NOT NULL,
+            prof_id INT NOT NULL,
+            lieu_id INT NOT NULL,
+            date_heure DATETIME NOT NULL,
+            duree_minutes INT NOT NULL,
+            valide_chef INT NOT NULL DEFAULT 0,
+            valide_doyen INT NOT NULL DEFAULT 0
+        )
+    """,
+    # Plan remplacé par la dernière publication, restaurable
+    "examens_precedent": """
+        CREATE TABLE IF NOT EXISTS examens_precedent (
+            id INT PRIMARY KEY,
+            module_id INT NOT NULL,
+            prof_id INT NOT NULL,
+            lieu_id INT NOT NULL,
+            date_heure DATETIME NOT NULL,
+            duree_minutes INT NOT NULL,
+            valide_chef INT NOT NULL DEFAULT 0,
+            valide_doyen INT NOT NULL DEFAULT 0
+        )
+    """,
+    # Nombre d'inscrits par module, resynchronisé quand les inscriptions changent
+    "effectifs_modules": """
+        CREATE TABLE IF NOT EXISTS effectifs_modules (
+            module_id INT PRIMARY KEY,
+            nb_etudiants INT NOT NULL
+        )
+    """,
+    # Numéro de version de l'EDT, incrémenté à chaque écriture dans examens
+    # (clé des caches de l'application)
+    "edt_version": """
+        CREATE TABLE IF NOT EXISTS edt_version (
+            id INT PRIMARY KEY,
+            version BIGINT NOT NULL
+        )
+    """,
+    # Signature des inscriptions dont les tables dérivées sont à jour
+    "inscriptions_signature": """
+        CREATE TABLE IF NOT EXISTS inscriptions_signature (
+            id INT PRIMARY KEY,
+            signature VARCHAR(100) NOT NULL
+        )
+    """,
+    # Indicateurs du tableau de bord, recalculés à chaque écriture dans examens
+    "kpi_snapshot": """
+        CREATE TABLE IF NOT EXISTS kpi_snapshot (
+            id INT PRIMARY KEY,
+            nb_examens INT NOT NULL,
+            nb_salles INT NOT NULL,
+            nb_profs INT NOT NULL,
+            nb_etudiants INT NOT NULL,
+            nb_conflits_salles INT NOT NULL,
+            nb_conflits_profs INT NOT NULL,
+            nb_conflits_etudiants INT NOT NULL,
+            calcule_le DATETIME NOT NULL
+        )
+    """,
+    # EDT dénormalisé (une ligne par examen), réécrit avec chaque écriture
+    # dans examens : les vues EDT le lisent sans jointure
+    "edt_snapshot": """
+        CREATE TABLE IF NOT EXISTS edt_snapshot (
+            examen_id INT PRIMARY KEY,
+            module_id INT NOT NULL,
+            module VARCHAR(255) NOT NULL,
+            formation_id INT NOT NULL,
+            formation VARCHAR(255) NOT NULL,
+            dept_id INT NOT NULL,
+            departement VARCHAR(255) NOT NULL,
+            prof_id INT NOT NULL,
+            professeur VARCHAR(255) NOT NULL,
+            lieu_id INT NOT NULL,
+            salle VARCHAR(255) NOT NULL,
+            capacite INT NOT NULL,
+            date_heure DATETIME NOT NULL,
+            duree_minutes INT NOT NULL,
+            nb_inscrits INT NOT NULL
+        )
+    """,
+    # Index inversé étudiant -> examens (calendrier personnel), réécrit avec
+    # edt_snapshot ; la clé primaire sert l'accès par étudiant
+    "edt_etudiants": """
+        CREATE TABLE IF NOT EXISTS edt_etudiants (
+            etudiant_id INT NOT NULL,
+            examen_id INT NOT NULL,
+            PRIMARY KEY (etudiant_id, examen_id)
+        )
+    """,
+    # Générations lancées en tâche de fond ; actif vaut 1 pour le job en
+    # cours et NULL sinon : UNIQUE interdit deux générations simultanées
+    "generation_jobs": """
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id VARCHAR(32) PRIMARY KEY,
+            actif INT UNIQUE,
+            statut VARCHAR(20) NOT NULL,
+            mode VARCHAR(20),
+            nb_essais INT,
+            graine INT,
+            progression REAL NOT NULL DEFAULT 0,
+            message VARCHAR(255),
+            nb_planifies INT,
+            nb_echecs INT,
+            echecs TEXT,
+            erreur TEXT,
+            debut DATETIME NOT NULL,
+            maj_le DATETIME NOT NULL,
+            fin DATETIME
+        )
+    """,
+}
+
+# Index créés au démarrage (tables dérivées et accès fréquents aux tables
+# de base) : nom -> "table (colonnes)"
+INDEX_AUXILIAIRES = {
+    "idx_examens_prof_date": "examens (prof_id, date_heure)",
+    "idx_edt_snapshot_page": "edt_snapshot (date_heure, examen_id)",
+    "idx_edt_snapshot_formation": "edt_snapshot (formation_id, date_heure)",
+    "idx_edt_snapshot_dept": "edt_snapshot (dept_id, date_heure)",
+    "idx_generation_jobs_debut": "generation_jobs (debut)",
+}
+
+
+# ==============================
+# MYSQL
+# ==============================
+class BackendMySQL:
+    nom = "mysql"
+
+    def __init__(self, config):
+        self.config = {
+            "host": config["host"],
+            "user": config["user"],
+            "password": config["password"],
+            "database": config["database"],
+            "port": config["port"],
+        }
+
+    def connecter(self):
+        import mysql.connector
+        return mysql.connector.connect(**self.config)
+
+    def est_vivante(self, conn):
+        return conn.is_connected()
+
+    def heure_minute(self, colonne):
+        return f"TIME_FORMAT({colonne}, '%H:%i')"
+
+    def concat_distinct(self, expression, ordre, separateur=", "):
+        return f"GROUP_CONCAT(DISTINCT {expression} ORDER BY {ordre} SEPARATOR '{separateur}')"
+
+
+# ==============================
+# SQLITE
+# ==============================
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+
+
+def _ligne_dict(cursor, ligne):
+    return {col[0]: val for col, val in zip(cursor.description, ligne)}
+
+
+class CurseurSQLite(sqlite3.Cursor):
+    # Requêtes écrites pour MySQL : paramètres %s -> ?
+
+    def execute(self, sql, parametres=()):
+        return super().execute(sql.replace("%s", "?"), parametres or ())
+
+    def executemany(self, sql, sequence):
+        return super().executemany(sql.replace("%s", "?"), sequence)
+
+
+class ConnexionSQLite(sqlite3.Connection):
+
+    def cursor(self, factory=CurseurSQLite, dictionary=False):
+        cur = super().cursor(factory)
+        if dictionary:
+            cur.row_factory = _ligne_dict
+        return cur
+
+    def execute(self, sql, parametres=()):
+        return self.cursor().execute(sql, parametres)
+
+
+class BackendSQLite:
+    nom = "sqlite"
+
+    def __init__(self, chemin, lecture_seule=False):
+        self.chemin = chemin
+        self.lecture_seule = lecture_seule
+
+    def connecter(self):
+        mode = "ro" if self.lecture_seule else "rwc"
+        conn = sqlite3.connect(
+            f"file:{self.chemin}?mode={mode}", uri=True, factory=ConnexionSQLite,
+            detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+        )
+        conn.execute("PRAGMA foreign_keys = ON")
+        if not self.lecture_seule:
+            conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def est_vivante(self, conn):
+        try:
+            conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def heure_minute(self, colonne):
+        return f"strftime('%H:%M', {colonne})"
+
+    def concat_distinct(self, expression, ordre, separateur=", "):
+        # SQLite n'accepte pas de séparateur ni d'ORDER BY avec DISTINCT
+        return f"REPLACE(GROUP_CONCAT(DISTINCT {expression}), ',', '{separateur}')"
+
+    def initialiser(self):
+        with open(SCHEMA_SQLITE, encoding="utf-8") as f:
+            schema = f.read()
+        conn = self.connecter()
+        try:
+            conn.executescript(schema)
+            creer_tables_auxiliaires(conn)
+        finally:
+            conn.close()
+
+
+# ==============================
+# POOL DE CONNEXIONS
+# ==============================
+class CurseurMesure:
+    """Curseur qui transmet chaque requête à `mesure` (durée d'exécution,
+    lignes écrites ou lues, erreur) ; la lecture des lignes d'un SELECT
+    s'ajoute ensuite à la même requête.
+    """
+
+    def __init__(self, curseur, mesure):
+        self._curseur = curseur
+        self._mesure = mesure
+        self._requete = None
+
+    def __getattr__(self, nom):
+        return getattr(self._curseur, nom)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _executer(self, methode, requete, args, kwargs):
+        self._requete = requete
+        debut = time.perf_counter()
+        try:
+            resultat = methode(requete, *args, **kwargs)
+        except Exception as err:
+            self._mesure.enregistrer_requete(requete, time.perf_counter() - debut, 0, err)
+            raise
+        # Un SELECT est compté à la lecture ; une écriture par rowcount
+        lignes = 0 if self._curseur.description is not None else max(self._curseur.rowcount, 0)
+        self._mesure.enregistrer_requete(requete, time.perf_counter() - debut, lignes)
+        return self if resultat is self._curseur else resultat
+
+    def execute(self, requete, *args, **kwargs):
+        return self._executer(self._curseur.execute, requete, args, kwargs)
+
+    def executemany(self, requete, *args, **kwargs):
+        return self._executer(self._curseur.executemany, requete, args, kwargs)
+
+    def _lire(self, methode, *args):
+        debut = time.perf_counter()
+        lignes = methode(*args)
+        nb = (lignes is not None) if methode == self._curseur.fetchone else len(lignes)
+        if self._requete is not None:
+            self._mesure.completer_requete(self._requete, time.perf_counter() - debut, int(nb))
+        return lignes
+
+    def fetchone(self):
+        return self._lire(self._curseur.fetchone)
+
+    def fetchmany(self, *args):
+        return self._lire(self._curseur.fetchmany, *args)
+
+    def fetchall(self):
+        return self._lire(self._curseur.fetchall)
+
+
+class ConnexionPoolee:
+    """Connexion empruntée au pool : `close()` la rend au lieu de la fermer."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._mesure = pool.mesure
+        self.creee_a = time.monotonic()
+        self.rendue_a = self.creee_a
+
+    def __getattr__(self, nom):
+        return getattr(self._conn, nom)
+
+    def cursor(self, *args, **kwargs):
+        curseur = self._conn.cursor(*args, **kwargs)
+        return curseur if self._mesure is None else CurseurMesure(curseur, self._mesure)
+
+    def close(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.rendre(self)
+
+
+class PoolConnexions:
+    """Pool de connexions réutilisées, partagé par tout le processus.
+
+    - taille : nombre maximal de connexions ouvertes
+    - recyclage : âge (s) au-delà duquel une connexion est rouverte
+    - verifier : test de vie (ping / SELECT 1) avant l'emprunt d'une
+      connexion restée libre plus de `inactivite` s (évite un aller-retour
+      par requête pour les connexions qui viennent de servir)
+    - attente : délai (s) max pour obtenir une connexion quand tout est pris
+    - mesure : objet `enregistrer_requete` / `completer_requete` (voir
+      diagnostics.Diagnostics) qui reçoit chaque requête des curseurs
+    """
+
+    def __init__(self, backend, taille=5, recyclage=1800, verifier=True, inactivite=30, attente=30,
+                 mesure=None):
+        self.backend = backend
+        self.mesure = mesure
+        self.taille = taille
+        self.recyclage = recyclage
+        self.verifier = verifier
+        self.inactivite = inactivite
+        self.attente = attente
+        self._libres = []   # pile : la connexion la plus récemment rendue ressort d'abord
+        self._ouvertes = 0
+        # Protège _libres / _ouvertes ; notifié à chaque connexion rendue ou
+        # fermée, pour réveiller un appelant qui attend une place
+        self._condition = threading.Condition()
+
+    def _ouvrir(self):
+        return ConnexionPoolee(self, self.backend.connecter())
+
+    def _fermer(self, conn):
+        with self._condition:
+            self._ouvertes -= 1
+            self._condition.notify()
+        try:
+            conn._conn.close()
+        except Exception:
+            pass
+
+    def connexion(self):
+        limite = time.monotonic() + self.attente
+        while True:
+            with self._condition:
+                while not self._libres and self._ouvertes >= self.taille:
+                    reste = limite - time.monotonic()
+                    if reste <= 0:
+                        raise TimeoutError(f"Aucune connexion libre après {self.attente} s (pool de {self.taille})")
+                    self._condition.wait(reste)
+                if self._libres:
+                    conn = self._libres.pop()
+                else:
+                    conn = None
+                    self._ouvertes += 1
+
+            if conn is None:
+                try:
+                    return self._ouvrir()
+                except Exception:
+                    with self._condition:
+                        self._ouvertes -= 1
+                        self._condition.notify()
+                    raise
+
+            maintenant = time.monotonic()
+            if maintenant - conn.creee_a > self.recyclage or (
+                    self.verifier and maintenant - conn.rendue_a > self.inactivite
+                    and not self.backend.est_vivante(conn._conn)):
+                self._fermer(conn)
+                continue
+            conn._pool = self
+            return conn
+
+    def rendre(self, conn):
+        try:
+            # Ne jamais rendre une transaction entamée au suivant
+            conn._conn.rollback()
+        except Exception:
+            self._fermer(conn)
+            return
+        conn.rendue_a = time.monotonic()
+        with self._condition:
+            self._libres.append(conn)
+            self._condition.notify()
+
+
+# ==============================
+# SÉLECTION DU BACKEND
+# ==============================
+def backend_depuis_config(secrets):
+    """EXAMENS_SQLITE=<fichier> (variable d'environnement) ou une section
+    [sqlite] dans les secrets basculent sur SQLite ; sinon MySQL via [mysql].
+    EXAMENS_SQLITE_LECTURE_SEULE=1 ouvre la base en lecture seule.
+    """
+    chemin = os.environ.get("EXAMENS_SQLITE")
+    if chemin:
+        return BackendSQLite(chemin, lecture_seule=os.environ.get("EXAMENS_SQLITE_LECTURE_SEULE") == "1")
+    if "sqlite" in secrets:
+        return BackendSQLite(secrets["sqlite"]["chemin"],
+                             lecture_seule=bool(secrets["sqlite"].get("lecture_seule", False)))
+    return BackendMySQL(secrets["mysql"])
+
+
+def creer_tables_auxiliaires(conn):
+    cur = conn.cursor()
+    for ddl in TABLES_AUXILIAIRES.values():
+        cur.execute(ddl)
+    for nom, cible in INDEX_AUXILIAIRES.items():
+        # Pas de CREATE INDEX IF NOT EXISTS sous MySQL : un index déjà
+        # présent lève une erreur, ignorée
+        try:
+            cur.execute(f"CREATE INDEX {nom} ON {cible}")
+        except Exception:
+            pass
+    conn.commit()
+
+
+def inserer_tables(conn, tables, taille_lot=5000):
+    """Insère des lignes {table: [dict, ...]} (ordre de TABLES respecté)."""
+    cur = conn.cursor()
+    for table in TABLES + list(TABLES_AUXILIAIRES):
+        lignes = tables.get(table)
+        if not lignes:
+            continue
+        colonnes = list(lignes[0])
+        sql = (f"INSERT INTO {table} ({', '.join(colonnes)}) "
+               f"VALUES ({', '.join(['%s'] * len(colonnes))})")
+        for debut in range(0, len(lignes), taille_lot):
+            lot = lignes[debut:debut + taille_lot]
+            cur.executemany(sql, [tuple(l[c] for c in colonnes) for l in lot])
+    conn.commit()
+
+
+def inserer_par_lots(cur, table, colonnes, lignes, taille_lot=500):
+    """INSERT multi-lignes (`VALUES (...), (...), ...`), un aller-retour par lot."""
+    valeurs = f"({', '.join(['%s'] * len(colonnes))})"
+    for debut in range(0, len(lignes), taille_lot):
+        lot = lignes[debut:debut + taille_lot]
+        cur.execute(f"INSERT INTO {table} ({', '.join(colonnes)}) VALUES {', '.join([valeurs] * len(lot))}",
+                    tuple(v for ligne in lot for v in ligne))
+
+
+def copier_vers_sqlite(source, chemin, taille_lot=5000):
+    """Copie toutes les tables de `source` dans une base SQLite neuve
+    (instantané du planning publié, à ouvrir ensuite en lecture seule).
+    """
+    if isinstance(source, BackendSQLite) and os.path.abspath(source.chemin) == os.path.abspath(chemin):
+        raise ValueError("La source et l'instantané doivent être deux fichiers différents")
+    # Copie dans un fichier temporaire du même dossier, mis en place par
+    # os.replace seulement si elle réussit : l'instantané précédent reste
+    # lisible jusque-là (et intact en cas d'échec)
+    descripteur, temporaire = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(chemin)))
+    os.close(descripteur)
+    os.remove(temporaire)
+    conn_source = conn_cible = None
+    reussi = False
+    try:
+        BackendSQLite(temporaire).initialiser()
+        conn_source = source.connecter()
+        conn_cible = BackendSQLite(temporaire).connecter()
+        cur_source = conn_source.cursor(dictionary=True)
+        for table in TABLES + list(TABLES_AUXILIAIRES):
+            colonnes = [c[1] for c in conn_cible.execute(f"PRAGMA table_info({table})").fetchall()]
+            cur_source.execute(f"SELECT {', '.join(colonnes)} FROM {table}")
+            while True:
+                lot = cur_source.fetchmany(taille_lot)
+                if not lot:
+                    break
+                inserer_tables(conn_cible, {table: lot}, taille_lot)
+        conn_cible.execute("PRAGMA journal_mode = DELETE")
+        conn_cible.commit()
+        reussi = True
+    finally:
+        for conn in (conn_source, conn_cible):
+            if conn is not None:
+                conn.close()
+        if not reussi:
+            for fichier in (temporaire, temporaire + "-wal", temporaire + "-shm"):
+                if os.path.exists(fichier):
+                    os.remove(fichier)
+    os.replace(temporaire, chemin)
+    return BackendSQLite(chemin)
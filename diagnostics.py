@@ -0,0 +1,152 @@
+"""Mesures de performance de l'application : latence et volume des requêtes,
+succès / défauts des caches `st.cache_data`, durée des reruns par tableau
+de bord.
+
+Les compteurs vivent en mémoire, un jeu par processus Streamlit (le module
+n'est importé qu'une fois), et s'exportent en JSON depuis la page
+d'administration pour comparer deux versions avant une session d'examens.
+"""
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+HISTORIQUE_MAX = 200   # dernières requêtes gardées en détail
+LIBELLE_MAX = 300      # longueur max du texte SQL conservé
+
+
+def _libelle(requete):
+    return " ".join(str(requete).split())[:LIBELLE_MAX]
+
+
+def _ms(duree_s):
+    return round(duree_s * 1000, 2)
+
+
+class Diagnostics:
+    """Compteurs partagés par toutes les sessions du processus."""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        with self._verrou:
+            self.depuis = datetime.now()
+            self.requetes = {}      # texte SQL -> {appels, total_s (exécution + lecture), max_s, lignes, erreurs}
+            self.historique = deque(maxlen=HISTORIQUE_MAX)
+            self.caches = {}        # fonction -> {succes, defauts}
+            self.reruns = {}        # tableau de bord -> {reruns, total_s, max_s, dernier_s}
+
+    def enregistrer_requete(self, requete, duree_s, nb_lignes, erreur=None):
+        libelle = _libelle(requete)
+        with self._verrou:
+            stats = self.requetes.setdefault(
+                libelle, {"appels": 0, "total_s": 0.0, "max_s": 0.0, "lignes": 0, "erreurs": 0})
+            stats["appels"] += 1
+            stats["total_s"] += duree_s
+            stats["max_s"] = max(stats["max_s"], duree_s)
+            stats["lignes"] += nb_lignes
+            stats["erreurs"] += erreur is not None
+            self.historique.append({
+                "horodatage": datetime.now().isoformat(timespec="milliseconds"),
+                "requete": libelle, "duree_ms": _ms(duree_s), "lignes": nb_lignes,
+                "erreur": None if erreur is None else str(erreur),
+            })
+
+    def completer_requete(self, requete, duree_s, nb_lignes):
+        # Lecture des lignes d'une requête déjà enregistrée (fetch*)
+        libelle = _libelle(requete)
+        with self._verrou:
+            stats = self.requetes.get(libelle)
+            if stats is not None:
+                stats["total_s"] += duree_s
+                stats["lignes"] += nb_lignes
+
+    def appel_cache(self, fonction, defaut):
+        with self._verrou:
+            stats = self.caches.setdefault(fonction, {"succes": 0, "defauts": 0})
+            stats["succes"] += not defaut
+            stats["defauts"] += defaut
+
+    @contextmanager
+    def mesurer_rerun(self, tableau):
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            # st.rerun() / st.stop() passent aussi par ici : le rerun est compté
+            duree_s = time.perf_counter() - debut
+            with self._verrou:
+                stats = self.reruns.setdefault(tableau, {"reruns": 0, "total_s": 0.0, "max_s": 0.0, "dernier_s": 0.0})
+                stats["reruns"] += 1
+                stats["total_s"] += duree_s
+                stats["max_s"] = max(stats["max_s"], duree_s)
+                stats["dernier_s"] = duree_s
+
+    def instantane(self):
+        """Copie sérialisable des compteurs, requêtes triées par temps total."""
+        with self._verrou:
+            requetes = [
+                {"requete": libelle, "appels": s["appels"], "total_ms": _ms(s["total_s"]),
+                 "moyenne_ms": _ms(s["total_s"] / s["appels"]), "max_ms": _ms(s["max_s"]),
+                 "lignes": s["lignes"], "erreurs": s["erreurs"]}
+                for libelle, s in self.requetes.items()
+            ]
+            caches = []
+            for fonction, s in self.caches.items():
+                total = s["succes"] + s["defauts"]
+                caches.append({"fonction": fonction, "appels": total, "succes": s["succes"],
+                               "defauts": s["defauts"], "taux_succes": round(s["succes"] / total, 3)})
+            reruns = [
+                {"tableau": tableau, "reruns": s["reruns"], "moyenne_ms": _ms(s["total_s"] / s["reruns"]),
+                 "max_ms": _ms(s["max_s"]), "dernier_ms": _ms(s["dernier_s"])}
+                for tableau, s in self.reruns.items()
+            ]
+            historique = list(self.historique)
+        return {
+            "depuis": self.depuis.isoformat(timespec="seconds"),
+            "genere_le": datetime.now().isoformat(timespec="seconds"),
+            "requetes": sorted(requetes, key=lambda r: r["total_ms"], reverse=True),
+            "caches": sorted(caches, key=lambda c: c["fonction"]),
+            "reruns": sorted(reruns, key=lambda r: r["tableau"]),
+            "historique": historique,
+        }
+
+    def exporter_json(self):
+        return json.dumps(self.instantane(), ensure_ascii=False, indent=2)
+
+
+DIAGNOSTICS = Diagnostics()
+
+
+def cache_data(**options):
+    """`st.cache_data(**options)` qui compte, par fonction, les appels servis
+    par le cache et les recalculs. `.clear()` reste disponible.
+    """
+    def decorateur(fonction):
+        nom = fonction.__name__
+        calcule = threading.local()
+
+        @functools.wraps(fonction)
+        def calcul(*args, **kwargs):
+            calcule.oui = True
+            return fonction(*args, **kwargs)
+
+        en_cache = st.cache_data(**options)(calcul)
+
+        @functools.wraps(fonction)
+        def appel(*args, **kwargs):
+            calcule.oui = False
+            resultat = en_cache(*args, **kwargs)
+            DIAGNOSTICS.appel_cache(nom, calcule.oui)
+            return resultat
+
+        appel.clear = en_cache.clear
+        return appel
+    return decorateur
@@ -0,0 +1,135 @@
+"""Export de l'EDT publié (table edt_snapshot) en CSV, Parquet ou iCalendar.
+
+Les lignes sont lues par lots (`fetchmany`) et sérialisées au fil de l'eau :
+ni la liste complète des lignes ni un DataFrame ne sont construits. Le
+fichier produit est, lui, rendu en entier (`bytes`), comme l'exige
+`st.download_button`.
+"""
+import csv
+import importlib.util
+import io
+from datetime import datetime, timedelta, timezone
+
+TAILLE_LOT = 2000
+
+COLONNES = ["examen_id", "module", "formation", "departement", "professeur", "salle",
+            "capacite", "date_heure", "duree_minutes", "nb_inscrits"]
+
+# format -> (libellé, type MIME)
+FORMATS = {
+    "csv": ("CSV", "text/csv"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+    "ics": ("iCalendar", "text/calendar"),
+}
+
+
+def parquet_disponible():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def lots_edt(conn, where="1=1", params=(), taille_lot=TAILLE_LOT):
+    cur = conn.cursor(dictionary=True)
+    cur.execute(f"""
+        SELECT {', '.join(COLONNES)}
+        FROM edt_snapshot
+        WHERE {where}
+        ORDER BY date_heure, examen_id
+    """, tuple(params))
+    while True:
+        lot = cur.fetchmany(taille_lot)
+        if not lot:
+            break
+        yield lot
+
+
+def ecrire_csv(lots, sortie):
+    texte = io.TextIOWrapper(sortie, encoding="utf-8", newline="", write_through=True)
+    writer = csv.DictWriter(texte, COLONNES)
+    writer.writeheader()
+    for lot in lots:
+        writer.writerows(lot)
+    texte.detach()
+
+
+def ecrire_parquet(lots, sortie):
+    # Dépendance optionnelle, importée seulement pour ce format
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("examen_id", pa.int64()), ("module", pa.string()), ("formation", pa.string()),
+        ("departement", pa.string()), ("professeur", pa.string()), ("salle", pa.string()),
+        ("capacite", pa.int64()), ("date_heure", pa.timestamp("s")), ("duree_minutes", pa.int64()),
+        ("nb_inscrits", pa.int64()),
+    ])
+    with pq.ParquetWriter(sortie, schema) as writer:
+        for lot in lots:
+            # Un groupe de lignes Parquet par lot
+            writer.write_table(pa.Table.from_pylist(lot, schema=schema))
+
+
+def _echapper(texte):
+    return (str(texte).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _plier(ligne):
+    # RFC 5545 : lignes de 75 octets max, continuation par CRLF + espace
+    octets = ligne.encode("utf-8")
+    morceaux = []
+    while len(octets) > 75:
+        coupe = 75 if not morceaux else 74
+        while coupe > 0 and (octets[coupe] & 0xC0) == 0x80:
+            coupe -= 1
+        morceaux.append(octets[:coupe])
+        octets = octets[coupe:]
+    morceaux.append(octets)
+    return b"\r\n ".join(morceaux) + b"\r\n"
+
+
+def _date_ics(valeur):
+    return valeur.strftime("%Y%m%dT%H%M%S")
+
+
+def ecrire_ics(lots, sortie, nom="Examens"):
+    horodatage = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    for ligne in ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Plateforme Examens//EDT//FR",
+                  "CALSCALE:GREGORIAN", f"X-WR-CALNAME:{_echapper(nom)}"):
+        sortie.write(_plier(ligne))
+    for lot in lots:
+        for exam in lot:
+            debut = exam["date_heure"]
+            fin = debut + timedelta(minutes=int(exam["duree_minutes"]))
+            description = (f"{exam['formation']} ({exam['departement']})\n"
+                           f"Surveillant : {exam['professeur']}\n"
+                           f"Inscrits : {exam['nb_inscrits']}")
+            for ligne in ("BEGIN:VEVENT",
+                          f"UID:examen-{exam['examen_id']}@plateforme-examens",
+                          f"DTSTAMP:{horodatage}",
+                          f"DTSTART:{_date_ics(debut)}",
+                          f"DTEND:{_date_ics(fin)}",
+                          f"SUMMARY:{_echapper('Examen - ' + exam['module'])}",
+                          f"LOCATION:{_echapper(exam['salle'])}",
+                          f"DESCRIPTION:{_echapper(description)}",
+                          "END:VEVENT"):
+                sortie.write(_plier(ligne))
+    sortie.write(_plier("END:VCALENDAR"))
+
+
+def exporter(conn, format_, where="1=1", params=(), nom="Examens", taille_lot=TAILLE_LOT):
+    """Contenu du fichier exporté (`bytes`), prêt à être servi.
+
+    `where` / `params` filtrent edt_snapshot (même syntaxe que les requêtes
+    de l'application) ; `nom` est le titre du calendrier .ics.
+    """
+    if format_ not in FORMATS:
+        raise ValueError(f"Format d'export inconnu : {format_}")
+    sortie = io.BytesIO()
+    lots = lots_edt(conn, where, params, taille_lot)
+    if format_ == "csv":
+        ecrire_csv(lots, sortie)
+    elif format_ == "parquet":
+        ecrire_parquet(lots, sortie)
+    else:
+        ecrire_ics(lots, sortie, nom)
+    return sortie.getvalue()
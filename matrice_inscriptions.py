@@ -0,0 +1,114 @@
+"""Matrice creuse des inscriptions (modules x étudiants).
+
+Stockage CSR en NumPy : la ligne k (module) contient les indices denses
+des étudiants inscrits, `indices[indptr[k]:indptr[k + 1]]`. Le graphe de
+chevauchement modules x modules (nombre d'étudiants partagés) est le
+produit A·Aᵀ, calculé une seule fois et lui aussi stocké en CSR.
+"""
+import zlib
+
+import numpy as np
+
+
+class MatriceInscriptions:
+
+    def __init__(self, module_ids, etudiant_ids):
+        module_ids = np.asarray(module_ids, dtype=np.int64)
+        etudiant_ids = np.asarray(etudiant_ids, dtype=np.int64)
+
+        self.module_ids = np.unique(module_ids)
+        self.etudiant_ids = np.unique(etudiant_ids)
+        nb_etudiants = max(len(self.etudiant_ids), 1)
+
+        lignes = np.searchsorted(self.module_ids, module_ids)
+        colonnes = np.searchsorted(self.etudiant_ids, etudiant_ids)
+        # Tri (ligne, colonne) + suppression des doublons = ordre CSR
+        cles = np.unique(lignes * nb_etudiants + colonnes)
+        lignes = cles // nb_etudiants
+
+        self.indices = (cles % nb_etudiants).astype(np.int32)
+        self.indptr = np.zeros(len(self.module_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lignes, minlength=len(self.module_ids)), out=self.indptr[1:])
+        self._rang = {int(m): k for k, m in enumerate(self.module_ids)}
+        self._chevauchements = None
+
+    @classmethod
+    def depuis_dict(cls, etudiants_par_module):
+        module_ids = []
+        etudiant_ids = []
+        for module_id, etudiants in etudiants_par_module.items():
+            module_ids.extend([module_id] * len(etudiants))
+            etudiant_ids.extend(etudiants)
+        return cls(module_ids, etudiant_ids)
+
+    @property
+    def nb_modules(self):
+        return len(self.module_ids)
+
+    @property
+    def nb_etudiants(self):
+        return len(self.etudiant_ids)
+
+    def etudiants(self, module_id):
+        k = self._rang.get(module_id)
+        if k is None:
+            return self.indices[:0]
+        return self.indices[self.indptr[k]:self.indptr[k + 1]]
+
+    def effectifs(self):
+        return dict(zip(self.module_ids.tolist(), np.diff(self.indptr).tolist()))
+
+    def signatures(self):
+        """CRC32 de la liste triée des étudiants de chaque module."""
+        return {
+            int(m): zlib.crc32(self.etudiant_ids[self.indices[self.indptr[k]:self.indptr[k + 1]]].tobytes())
+            for k, m in enumerate(self.module_ids)
+        }
+
+    def chevauchements(self):
+        """Produit A·Aᵀ hors diagonale, en CSR : (indptr, voisins, partages)."""
+        if self._chevauchements is None:
+            self._chevauchements = self._calculer_chevauchements()
+        return self._chevauchements
+
+    def voisins(self, module_id):
+        indptr, voisins, partages = self.chevauchements()
+        k = self._rang.get(module_id)
+        if k is None:
+            return voisins[:0], partages[:0]
+        return voisins[indptr[k]:indptr[k + 1]], partages[indptr[k]:indptr[k + 1]]
+
+    def _calculer_chevauchements(self):
+        nb_modules = self.nb_modules
+        lignes = np.repeat(np.arange(nb_modules, dtype=np.int64), np.diff(self.indptr))
+
+        # Transposée : paires (étudiant, module) triées par étudiant
+        ordre = np.lexsort((lignes, self.indices))
+        etudiants = self.indices[ordre]
+        modules = lignes[ordre]
+
+        # Pour chaque décalage d, les paires (modules[i], modules[i + d])
+        # du même étudiant ; d est borné par le nombre max de modules
+        # d'un étudiant.
+        paires = []
+        decalage = 1
+        while decalage < len(etudiants):
+            meme = etudiants[decalage:] == etudiants[:-decalage]
+            if not meme.any():
+                break
+            a = modules[:-decalage][meme]
+            b = modules[decalage:][meme]
+            paires.append(a * nb_modules + b)
+            paires.append(b * nb_modules + a)
+            decalage += 1
+
+        if paires:
+            cles, partages = np.unique(np.concatenate(paires), return_counts=True)
+        else:
+            cles = np.empty(0, dtype=np.int64)
+            partages = np.empty(0, dtype=np.int64)
+
+        indptr = np.zeros(nb_modules + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cles // max(nb_modules, 1), minlength=nb_modules), out=indptr[1:])
+        voisins = self.module_ids[cles % max(nb_modules, 1)]
+        return indptr, voisins, partages.astype(np.int32)
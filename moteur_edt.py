@@ -0,0 +1,426 @@
+"""Moteur de planification des examens.
+
+Aucune dépendance à Streamlit ni à MySQL : le moteur reçoit des données
+brutes (listes de dictionnaires) et renvoie le planning calculé.
+"""
+import heapq
+import multiprocessing
+import os
+import random
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from matrice_inscriptions import MatriceInscriptions
+
+# ==============================
+# PARAMÈTRES PAR DÉFAUT
+# ==============================
+DUREE_EXAM = 90
+CRENEAUX = ["08:30", "11:00", "14:00"]
+MAX_SALLES_PER_SLOT = 50
+
+
+# ==============================
+# CALENDRIER
+# ==============================
+class Calendrier:
+    """Créneaux de la session numérotés 0..N-1, construits une seule fois.
+
+    creneau = jour * len(creneaux) + rang de l'heure ; les jours exclus
+    (jours de semaine, 0 = lundi, ou dates précises) ne reçoivent pas
+    d'indice.
+    """
+
+    def __init__(self, date_debut, date_fin, creneaux=CRENEAUX,
+                 jours_exclus=(), dates_exclues=()):
+        dates_exclues = {d.date() if isinstance(d, datetime) else d for d in dates_exclues}
+        self.jours = []
+        for offset in range((date_fin - date_debut).days + 1):
+            jour = (date_debut + timedelta(days=offset)).date()
+            if jour.weekday() in jours_exclus or jour in dates_exclues:
+                continue
+            self.jours.append(jour)
+
+        heures = [datetime.strptime(h, "%H:%M").time() for h in creneaux]
+        self.nb_creneaux_jour = len(heures)
+        self.datetimes = [datetime.combine(jour, h) for jour in self.jours for h in heures]
+        self.index = {dt: k for k, dt in enumerate(self.datetimes)}
+
+    @property
+    def nb_jours(self):
+        return len(self.jours)
+
+    @property
+    def nb_creneaux(self):
+        return len(self.datetimes)
+
+
+# ==============================
+# INDEX DES SALLES LIBRES
+# ==============================
+class IndexSalles:
+    """Salles libres par créneau, triées par capacité croissante.
+
+    `reserver` renvoie la plus petite salle libre qui contient l'effectif
+    (best-fit) : les amphis restent disponibles pour les gros modules.
+    """
+
+    def __init__(self, salles, nb_creneaux):
+        self._toutes = sorted((s["capacite"], rang, s["id"]) for rang, s in enumerate(salles))
+        self._libres = [None] * nb_creneaux
+
+    def reserver(self, creneau, effectif):
+        libres = self._libres[creneau]
+        if libres is None:
+            libres = self._libres[creneau] = list(self._toutes)
+
+        pos = bisect_left(libres, (effectif,))
+        if pos == len(libres):
+            return None
+        return libres.pop(pos)[2]
+
+    def retirer(self, creneau, salle_id):
+        if self._libres[creneau] is None:
+            self._libres[creneau] = list(self._toutes)
+        libres = self._libres[creneau]
+        for pos, entree in enumerate(libres):
+            if entree[2] == salle_id:
+                del libres[pos]
+                return True
+        return False
+
+
+# ==============================
+# POOL DE PROFESSEURS
+# ==============================
+class PoolProfesseurs:
+    """Tas (charge, rang, prof_id) : le moins chargé est toujours au sommet.
+
+    Un professeur ne surveille qu'un examen par créneau ; les professeurs
+    déjà occupés sur le créneau demandé sont mis de côté puis remis dans
+    le tas, leur nombre est borné par le nombre de salles du créneau.
+    """
+
+    def __init__(self, profs, nb_creneaux, charges=None):
+        charges = charges or {}
+        self.charge = {p["id"]: charges.get(p["id"], 0) for p in profs}
+        self.occupes = [set() for _ in range(nb_creneaux)]
+        self._tas = [(self.charge[p["id"]], rang, p["id"]) for rang, p in enumerate(profs)]
+        heapq.heapify(self._tas)
+
+    def disponible(self, creneau):
+        return len(self.occupes[creneau]) < len(self._tas)
+
+    def affecter(self, creneau):
+        occupes = self.occupes[creneau]
+        mis_de_cote = []
+        choisi = None
+        while self._tas:
+            entree = heapq.heappop(self._tas)
+            if entree[2] in occupes:
+                mis_de_cote.append(entree)
+                continue
+            choisi = entree
+            break
+
+        for entree in mis_de_cote:
+            heapq.heappush(self._tas, entree)
+
+        if choisi is None:
+            return None
+
+        charge, rang, prof_id = choisi
+        heapq.heappush(self._tas, (charge + 1, rang, prof_id))
+        self.charge[prof_id] = charge + 1
+        occupes.add(prof_id)
+        return prof_id
+
+
+# ==============================
+# GRAPHE DE CONFLITS
+# ==============================
+def graphe_conflits(modules, inscriptions):
+    """Voisins de chaque module (par position dans `modules`).
+
+    Deux modules sont en conflit s'ils partagent un étudiant (graphe de
+    chevauchement de la matrice d'inscriptions) ou la même formation :
+    dans les deux cas ils ne peuvent pas tomber le même jour.
+    """
+    position = {m["module_id"]: k for k, m in enumerate(modules)}
+    voisins = [set() for _ in modules]
+
+    par_formation = {}
+    for k, module in enumerate(modules):
+        par_formation.setdefault(module["formation_id"], []).append(k)
+        ids, _ = inscriptions.voisins(module["module_id"])
+        voisins[k].update(position[v] for v in ids.tolist() if v in position)
+
+    for groupe in par_formation.values():
+        for k in groupe:
+            voisins[k].update(groupe)
+    for k, v in enumerate(voisins):
+        v.discard(k)
+    return voisins
+
+
+def ordre_dsatur(modules, voisins, jours_places):
+    """Générateur DSatur : renvoie à chaque pas le module non planifié dont
+    les voisins occupent le plus de jours distincts (saturation), départagé
+    par degré puis effectif. `jours_places[k]` est lu après chaque pas.
+    """
+    saturation = [set() for _ in modules]
+    restants = set(range(len(modules)))
+    tas = [(0, -len(voisins[k]), -modules[k]["nb_etudiants"], k) for k in restants]
+    heapq.heapify(tas)
+
+    while tas:
+        sat, _, _, k = heapq.heappop(tas)
+        if k not in restants or -sat != len(saturation[k]):
+            continue
+        restants.discard(k)
+        yield k
+
+        jour = jours_places[k]
+        if jour is None:
+            continue
+        for v in voisins[k]:
+            if v in restants and jour not in saturation[v]:
+                saturation[v].add(jour)
+                heapq.heappush(tas, (-len(saturation[v]), -len(voisins[v]),
+                                     -modules[v]["nb_etudiants"], v))
+
+
+# ==============================
+# PLANIFICATION
+# ==============================
+MODES = {
+    "glouton": "Glouton (effectifs décroissants)",
+    "dsatur": "DSatur (graphe de conflits)",
+}
+
+
+def planifier_examens(modules, salles, profs, inscriptions,
+                      date_debut, date_fin, creneaux=CRENEAUX,
+                      duree=DUREE_EXAM, max_salles_par_slot=MAX_SALLES_PER_SLOT,
+                      jours_exclus=(), dates_exclues=(), mode="glouton",
+                      decalage_creneaux=0, examens_fixes=(), progression=None):
+    """Planifie un examen par module.
+
+    - modules : dicts {module_id, module, formation_id, nb_etudiants},
+      déjà triés par priorité (nb_etudiants DESC)
+    - salles : dicts {id, nom, capacite}
+    - profs : dicts {id, nom}
+    - inscriptions : MatriceInscriptions, ou {module_id: [etudiant_id, ...]}
+    - jours_exclus / dates_exclues : jours sans examen (ex. vendredis, fériés)
+    - mode : "glouton" (ordre de `modules`) ou "dsatur" (coloration du
+      graphe de conflits, ordre par saturation)
+    - decalage_creneaux : décale la rotation des heures de départ
+    - examens_fixes : examens conservés d'un planning précédent, dicts
+      {module_id, formation_id, prof_id, lieu_id, date_heure} ; ils occupent
+      leurs ressources et ne sont pas renvoyés
+    - progression : callback optionnel (index, total, module)
+
+    Retourne {"examens": [(module_id, prof_id, lieu_id, date_heure, duree)],
+              "echecs": [nom_module, ...],
+              "durees": {phase: secondes}}.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Mode de planification inconnu : {mode}")
+
+    debut = time.perf_counter()
+
+    calendrier = Calendrier(date_debut, date_fin, creneaux, jours_exclus, dates_exclues)
+    nb_creneaux_jour = calendrier.nb_creneaux_jour
+    if not isinstance(inscriptions, MatriceInscriptions):
+        inscriptions = MatriceInscriptions.depuis_dict(inscriptions)
+    index_formations = {}
+    for module in list(modules) + list(examens_fixes):
+        index_formations.setdefault(module["formation_id"], len(index_formations))
+
+    # Tout l'état d'occupation est indexé par entiers (jour / créneau)
+    formation_jour = np.zeros((len(index_formations), calendrier.nb_jours), dtype=bool)
+    etudiant_jour = np.zeros((calendrier.nb_jours, inscriptions.nb_etudiants), dtype=bool)
+    salles_par_creneau = np.zeros(calendrier.nb_creneaux, dtype=np.int32)
+    index_salles = IndexSalles(salles, calendrier.nb_creneaux)
+
+    charges_fixes = {}
+    for examen in examens_fixes:
+        charges_fixes[examen["prof_id"]] = charges_fixes.get(examen["prof_id"], 0) + 1
+    pool_profs = PoolProfesseurs(profs, calendrier.nb_creneaux, charges_fixes)
+
+    for examen in examens_fixes:
+        creneau = calendrier.index[examen["date_heure"]]
+        jour = creneau // nb_creneaux_jour
+        formation_jour[index_formations[examen["formation_id"]], jour] = True
+        etudiant_jour[jour, inscriptions.etudiants(examen["module_id"])] = True
+        salles_par_creneau[creneau] += 1
+        index_salles.retirer(creneau, examen["lieu_id"])
+        pool_profs.occupes[creneau].add(examen["prof_id"])
+
+    examens = []
+    echecs = []
+
+    def placer(i, module):
+        etudiants_module = inscriptions.etudiants(module["module_id"])
+        formation = index_formations[module["formation_id"]]
+
+        start_idx = (i + decalage_creneaux) % nb_creneaux_jour
+        ordre_heures = list(range(start_idx, nb_creneaux_jour)) + list(range(start_idx))
+
+        for jour in range(calendrier.nb_jours):
+            if formation_jour[formation, jour]:
+                continue
+
+            if etudiant_jour[jour, etudiants_module].any():
+                continue
+
+            for rang_heure in ordre_heures:
+                creneau = jour * nb_creneaux_jour + rang_heure
+
+                if salles_par_creneau[creneau] >= max_salles_par_slot:
+                    continue
+
+                if not pool_profs.disponible(creneau):
+                    continue
+
+                salle_id = index_salles.reserver(creneau, module["nb_etudiants"])
+                if salle_id is None:
+                    continue
+
+                prof_id = pool_profs.affecter(creneau)
+
+                examens.append((
+                    module["module_id"],
+                    prof_id,
+                    salle_id,
+                    calendrier.datetimes[creneau],
+                    duree
+                ))
+
+                formation_jour[formation, jour] = True
+                salles_par_creneau[creneau] += 1
+                etudiant_jour[jour, etudiants_module] = True
+                return jour
+
+        echecs.append(module["module"])
+        return None
+
+    durees = {"preparation": time.perf_counter() - debut}
+
+    if mode == "dsatur":
+        debut = time.perf_counter()
+        voisins = graphe_conflits(modules, inscriptions)
+        jours_places = [None] * len(modules)
+        ordre = ordre_dsatur(modules, voisins, jours_places)
+        durees["graphe_conflits"] = time.perf_counter() - debut
+    else:
+        jours_places = None
+        ordre = range(len(modules))
+
+    debut = time.perf_counter()
+
+    for i, k in enumerate(ordre):
+        module = modules[k]
+        if progression:
+            progression(i, len(modules), module)
+        jour = placer(i, module)
+        if jours_places is not None:
+            jours_places[k] = jour
+    durees["placement"] = time.perf_counter() - debut
+
+    return {"examens": examens, "echecs": echecs, "durees": durees}
+
+
+# ==============================
+# MULTI-DÉPART PARALLÈLE
+# ==============================
+def evaluer_plan(plan, modules, salles, profs):
+    """Score comparable (plus grand = meilleur) :
+    (modules placés, -écart-type de la charge des profs, remplissage moyen des salles).
+    """
+    examens = plan["examens"]
+    if not examens:
+        return (0, 0.0, 0.0)
+
+    effectifs = {m["module_id"]: m["nb_etudiants"] for m in modules}
+    capacites = {s["id"]: s["capacite"] for s in salles}
+    rang_prof = {p["id"]: k for k, p in enumerate(profs)}
+    charges = np.bincount([rang_prof[e[1]] for e in examens], minlength=len(profs))
+    remplissage = np.mean([effectifs[e[0]] / capacites[e[2]] for e in examens])
+    return (len(examens), -round(float(np.std(charges)), 6), round(float(remplissage), 6))
+
+
+def perturber(modules, rng, bruit=0.15):
+    """Ordre quasi décroissant des effectifs, avec un bruit multiplicatif."""
+    cles = [m["nb_etudiants"] * (1 + rng.uniform(-bruit, bruit)) for m in modules]
+    ordre = sorted(range(len(modules)), key=lambda k: -cles[k])
+    return [modules[k] for k in ordre]
+
+
+_DONNEES_WORKER = None
+
+
+def _initialiser_worker(donnees):
+    global _DONNEES_WORKER
+    _DONNEES_WORKER = donnees
+
+
+def _essai(essai, graine):
+    donnees = _DONNEES_WORKER
+    modules = donnees["modules"]
+    options = dict(donnees["options"])
+    if essai > 0:
+        # L'essai 0 reste le passage déterministe de référence
+        rng = random.Random(f"{graine}-{essai}")
+        modules = perturber(modules, rng)
+        options["decalage_creneaux"] = rng.randrange(len(options.get("creneaux", CRENEAUX)))
+
+    plan = planifier_examens(modules, donnees["salles"], donnees["profs"],
+                             donnees["inscriptions"], **options)
+    return essai, evaluer_plan(plan, modules, donnees["salles"], donnees["profs"]), plan
+
+
+def planifier_multi_depart(modules, salles, profs, inscriptions, nb_essais=8,
+                           graine=0, nb_processus=None, progression=None, **options):
+    """Lance `nb_essais` planifications perturbées en parallèle et garde la
+    meilleure selon `evaluer_plan`. Même graine = même résultat.
+
+    `options` est transmis tel quel à `planifier_examens` ; `progression`
+    est appelé (essais terminés, total) au fil des résultats.
+    """
+    if not isinstance(inscriptions, MatriceInscriptions):
+        inscriptions = MatriceInscriptions.depuis_dict(inscriptions)
+    inscriptions.chevauchements()  # calculé une fois, envoyé à chaque worker
+
+    donnees = {"modules": modules, "salles": salles, "profs": profs,
+               "inscriptions": inscriptions, "options": options}
+    nb_processus = min(nb_essais, nb_processus or os.cpu_count() or 1)
+
+    resultats = []
+    if nb_processus <= 1:
+        _initialiser_worker(donnees)
+        for essai in range(nb_essais):
+            resultats.append(_essai(essai, graine))
+            if progression:
+                progression(len(resultats), nb_essais)
+    else:
+        # spawn : pas de fork du processus Streamlit et de ses threads
+        with ProcessPoolExecutor(max_workers=nb_processus,
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_initialiser_worker,
+                                 initargs=(donnees,)) as pool:
+            futures = [pool.submit(_essai, essai, graine) for essai in range(nb_essais)]
+            for future in as_completed(futures):
+                resultats.append(future.result())
+                if progression:
+                    progression(len(resultats), nb_essais)
+
+    # Meilleur score, puis plus petit numéro d'essai : indépendant de l'ordre d'arrivée
+    essai, score, plan = max(resultats, key=lambda r: (r[1], -r[0]))
+    plan["essai"] = essai
+    plan["score"] = score
+    return plan
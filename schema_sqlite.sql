@@ -0,0 +1,66 @@
+-- Schéma de la base examens pour le backend SQLite embarqué
+-- (mêmes tables et colonnes que la base MySQL de production)
+
+CREATE TABLE IF NOT EXISTS departements (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS formations (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL,
+    dept_id INTEGER NOT NULL REFERENCES departements(id)
+);
+
+CREATE TABLE IF NOT EXISTS modules (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL,
+    formation_id INTEGER NOT NULL REFERENCES formations(id)
+);
+
+CREATE TABLE IF NOT EXISTS etudiants (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL,
+    prenom TEXT,
+    formation_id INTEGER REFERENCES formations(id)
+);
+
+CREATE TABLE IF NOT EXISTS inscriptions (
+    etudiant_id INTEGER NOT NULL REFERENCES etudiants(id),
+    module_id INTEGER NOT NULL REFERENCES modules(id),
+    PRIMARY KEY (etudiant_id, module_id)
+);
+CREATE INDEX IF NOT EXISTS idx_inscriptions_module ON inscriptions(module_id);
+
+CREATE TABLE IF NOT EXISTS lieux_examen (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL,
+    capacite INTEGER NOT NULL,
+    type TEXT
+);
+
+CREATE TABLE IF NOT EXISTS professeurs (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL,
+    dept_id INTEGER REFERENCES departements(id)
+);
+
+CREATE TABLE IF NOT EXISTS examens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    module_id INTEGER NOT NULL REFERENCES modules(id),
+    prof_id INTEGER NOT NULL REFERENCES professeurs(id),
+    lieu_id INTEGER NOT NULL REFERENCES lieux_examen(id),
+    date_heure DATETIME NOT NULL,
+    duree_minutes INTEGER NOT NULL,
+    valide_chef INTEGER NOT NULL DEFAULT 0,
+    valide_doyen INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_examens_date ON examens(date_heure);
+CREATE INDEX IF NOT EXISTS idx_examens_module ON examens(module_id);
+CREATE INDEX IF NOT EXISTS idx_examens_prof_date ON examens(prof_id, date_heure);
+
+CREATE TABLE IF NOT EXISTS surveillances (
+    examen_id INTEGER NOT NULL,
+    prof_id INTEGER NOT NULL REFERENCES professeurs(id),
+    PRIMARY KEY (examen_id, prof_id)
+);
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from conflits import detecter_conflits, paires_chevauchantes
+from matrice_inscriptions import MatriceInscriptions
+
+
+def paires_naives(ressources, debuts, fins):
+    return {
+        (i, j)
+        for i in range(len(debuts)) for j in range(i + 1, len(debuts))
+        if ressources[i] == ressources[j] and debuts[i] < fins[j] and debuts[j] < fins[i]
+    }
+
+
+def paires_trouvees(ressources, debuts, fins):
+    i, j = paires_chevauchantes(ressources, debuts, fins)
+    return {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+
+
+def test_chevauchement_contact_et_meme_debut():
+    ressources = [1, 1, 1, 1, 2, 2]
+    debuts = [0, 60, 90, 90, 0, 90]
+    fins = [90, 120, 180, 120, 90, 180]
+    # 0-1 se chevauchent, 0-2 / 0-3 se touchent seulement (fin == début),
+    # 2-3 commencent ensemble ; la ressource 2 bout à bout, sans conflit
+    attendu = {(0, 1), (1, 2), (1, 3), (2, 3)}
+    assert paires_naives(ressources, debuts, fins) == attendu
+    assert paires_trouvees(ressources, debuts, fins) == attendu
+
+
+def test_moins_de_deux_intervalles():
+    i, j = paires_chevauchantes([1], [0], [90])
+    assert len(i) == len(j) == 0
+
+
+def test_aleatoire_contre_force_brute():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        n = int(rng.integers(2, 40))
+        ressources = rng.integers(0, 4, n)
+        debuts = rng.integers(0, 20, n) * 30
+        fins = debuts + rng.choice([30, 60, 90], n)
+        assert paires_trouvees(ressources, debuts, fins) == paires_naives(ressources, debuts, fins)
+
+
+def test_detecter_conflits():
+    examens = pd.DataFrame({
+        "id": [101, 102, 103, 104],
+        "module_id": [1, 2, 3, 4],
+        "lieu_id": [7, 7, 8, 7],
+        "prof_id": [5, 6, 5, 6],
+        "date_heure": pd.to_datetime(["2026-01-10 08:30", "2026-01-10 09:00",
+                                      "2026-01-10 09:30", "2026-01-10 10:00"]),
+        "duree_minutes": [90, 60, 90, 90],
+    })
+    inscriptions = MatriceInscriptions.depuis_dict({1: [1, 2, 3], 2: [2, 3], 3: [3, 9], 4: [1]})
+    conflits = detecter_conflits(examens, inscriptions)
+
+    def paires(df):
+        return {(min(a, b), max(a, b)) for a, b in zip(df["examen_1"], df["examen_2"])}
+
+    # 08:30-10:00, 09:00-10:00, 09:30-11:00, 10:00-11:30
+    assert paires(conflits["salles"]) == {(101, 102)}
+    assert paires(conflits["profs"]) == {(101, 103)}
+    etudiants = {(a, b): n for a, b, n in conflits["etudiants"].itertuples(index=False)}
+    assert etudiants == {(101, 102): 2, (101, 103): 1, (102, 103): 1}
+
+
+def test_detecter_conflits_sans_examen():
+    vide = pd.DataFrame(columns=["id", "module_id", "lieu_id", "prof_id", "date_heure", "duree_minutes"])
+    conflits = detecter_conflits(vide)
+    assert all(df.empty for df in conflits.values())
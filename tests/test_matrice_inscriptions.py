@@ -0,0 +1,47 @@
+import numpy as np
+
+from matrice_inscriptions import MatriceInscriptions
+
+
+def partages_naifs(etudiants_par_module):
+    return {
+        (a, b): len(set(ea) & set(eb))
+        for a, ea in etudiants_par_module.items() for b, eb in etudiants_par_module.items()
+        if a != b and set(ea) & set(eb)
+    }
+
+
+def partages_calcules(matrice):
+    return {
+        (int(m), int(v)): int(p)
+        for m in matrice.module_ids
+        for v, p in zip(*matrice.voisins(int(m)))
+    }
+
+
+def test_structure_csr():
+    matrice = MatriceInscriptions.depuis_dict({20: [7, 3], 10: [3, 3, 5], 30: []})
+    assert matrice.module_ids.tolist() == [10, 20]
+    assert matrice.etudiant_ids[matrice.etudiants(10)].tolist() == [3, 5]
+    assert matrice.etudiant_ids[matrice.etudiants(20)].tolist() == [3, 7]
+    assert matrice.effectifs() == {10: 2, 20: 2}
+    assert len(matrice.etudiants(99)) == 0
+
+
+def test_chevauchements_petit_exemple():
+    inscriptions = {10: [1, 2, 3], 20: [2, 3], 30: [4], 40: [1, 3, 3]}
+    matrice = MatriceInscriptions.depuis_dict(inscriptions)
+    assert partages_calcules(matrice) == partages_naifs(inscriptions)
+    assert partages_calcules(matrice)[(10, 40)] == 2
+    assert len(matrice.voisins(30)[0]) == 0
+
+
+def test_chevauchements_aleatoires():
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        inscriptions = {
+            int(m): rng.choice(30, int(rng.integers(1, 12)), replace=False).tolist()
+            for m in rng.choice(100, int(rng.integers(1, 15)), replace=False)
+        }
+        matrice = MatriceInscriptions.depuis_dict(inscriptions)
+        assert partages_calcules(matrice) == partages_naifs(inscriptions)